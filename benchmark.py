@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Benchmark the site build and the annotator server on synthetic exam corpora.
+
+Usage:
+    python3 benchmark.py                          # 1x and 10x, compared with the baseline
+    python3 benchmark.py --scales 1,10,100        # add the 100x corpus
+    python3 benchmark.py --save-baseline          # record these numbers as the new baseline
+
+Each scale generates a throwaway copy of the extracted/ layout (exam JSONs,
+reference material, page scans and image annotations) with the bundled data
+replicated N times, points build_site_data and image_annotator at it, and times
+every phase. Peak memory is Python heap (tracemalloc) in this process only;
+crop workers run in child processes and are not included.
+"""
+
+import argparse
+import contextlib
+import copy
+import http.client
+import http.server
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import build_site_data as bsd
+import image_annotator as ia
+import scheduler
+import search_index
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_EXTRACTED = os.path.join(BASE_DIR, "extracted")
+BASELINE_FILE = os.path.join(BASE_DIR, "bench_baseline.json")
+REGRESSION_THRESHOLD = 0.25  # flag phases more than 25% slower than baseline...
+REGRESSION_MIN_SECONDS = 0.002  # ...and at least this much slower, to ignore timer noise
+MIN_PAGE_SIZE = (1240, 1754)  # A4 at 150 dpi
+STUDY_STEPS = 2000  # scheduler answers per timed run
+
+
+# --- Synthetic corpus ---
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _dump(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def exam_copies(src_dir, scale):
+    """Yield (filename, exam) for `scale` copies of each exam, numbered after the originals."""
+    files = [f for f in os.listdir(src_dir) if bsd.EXAM_FILE_RE.match(f)]
+    top = {}
+    for fname in files:
+        kind, n = bsd.EXAM_FILE_RE.match(fname).groups()
+        top[kind] = max(top.get(kind, 0), int(n))
+    for fname in files:
+        kind, n = bsd.EXAM_FILE_RE.match(fname).groups()
+        exam = _load(os.path.join(src_dir, fname))
+        for k in range(scale):
+            yield f"{kind}_exam_{int(n) + k * top[kind]}.json", exam
+
+
+def make_corpus(root, scale):
+    """Write a scale-N copy of extracted/ (plus the docs/ files the build touches) under root.
+
+    Returns counts used for throughput figures.
+    """
+    from PIL import Image, ImageDraw
+
+    extracted = os.path.join(root, "extracted")
+    images = os.path.join(extracted, "images")
+    os.makedirs(images)
+    os.makedirs(os.path.join(extracted, "question_images"))
+    shutil.copytree(os.path.join(BASE_DIR, "docs"), os.path.join(root, "docs"),
+                    ignore=shutil.ignore_patterns("images", "data"))
+
+    exams = 0
+    for fname, exam in exam_copies(SRC_EXTRACTED, scale):
+        _dump(os.path.join(extracted, fname), exam)
+        exams += 1
+    ref = _load(os.path.join(SRC_EXTRACTED, "reference_material.json"))
+    sections = ref["key_points_to_remember"]["sections"]
+    ref["key_points_to_remember"]["sections"] = [copy.deepcopy(s) for _ in range(scale) for s in sections]
+    _dump(os.path.join(extracted, "reference_material.json"), ref)
+
+    # Page scans: each annotated page copied `scale` times; tags stay unique per copy
+    src_anns = _load(os.path.join(SRC_EXTRACTED, "image_annotations.json"))
+    annotations = {}
+    rects = 0
+    for page, anns in src_anns.items():
+        boxes = [a for a in anns if not a.get("no_image")]
+        width = max([MIN_PAGE_SIZE[0]] + [a["x2"] + 10 for a in boxes])
+        height = max([MIN_PAGE_SIZE[1]] + [a["y2"] + 10 for a in boxes])
+        img = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(img)
+        for a in boxes:
+            draw.rectangle((a["x1"], a["y1"], a["x2"], a["y2"]), fill=(90, 120, 200), outline="black")
+        stem = page[:-4]
+        for k in range(scale):
+            name = page if k == 0 else f"{stem}_s{k:03d}.png"
+            img.save(os.path.join(images, name), compress_level=1)
+            suffix = "" if k == 0 else f"_s{k:03d}"
+            annotations[name] = [dict(a, tag=a["tag"] + suffix) for a in anns]
+            rects += len(boxes)
+    _dump(os.path.join(extracted, "image_annotations.json"), annotations)
+    return {"exams": exams, "pages": len(annotations), "rects": rects}
+
+
+def point_modules_at(root):
+    """Redirect both tools' path constants and caches to the synthetic corpus."""
+    os.chdir(root)
+    extracted = os.path.join(root, "extracted")
+    ia.EXTRACTED_DIR = extracted
+    ia.IMAGES_DIR = os.path.join(extracted, "images")
+    ia.Q_IMAGES_DIR = os.path.join(extracted, "question_images")
+    ia.ANNOTATIONS_FILE = os.path.join(extracted, "image_annotations.json")
+    ia.JOURNAL_FILE = os.path.join(extracted, "image_annotations.journal")
+    ia.CROPS_FILE = os.path.join(ia.Q_IMAGES_DIR, ".crops.json")
+    ia.PAGE_CACHE_DIR = os.path.join(extracted, ".page_cache")
+    ia._exam_cache.clear()
+    ia._pages_cache.update(key=None, entry=None)
+
+
+# --- Measurement ---
+
+def measure(fn, repeat):
+    """Best wall time over `repeat` runs, then one extra run under tracemalloc for peak heap."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def quiet(fn, *args, **kwargs):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(*args, **kwargs)
+    return run
+
+
+class _QuietHandler(ia.Handler):
+    def log_message(self, fmt, *args):
+        pass
+
+
+class _Client:
+    """The annotator Handler served from a background thread on an ephemeral port."""
+
+    def __init__(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _QuietHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def request(self, method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection(*self.server.server_address)
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        data = resp.read()
+        conn.close()
+        return resp, data
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_scale(scale, repeat, endpoint_requests):
+    root = tempfile.mkdtemp(prefix=f"bench_{scale}x_")
+    cwd = os.getcwd()
+    results = {}
+    try:
+        t0 = time.perf_counter()
+        counts = make_corpus(root, scale)
+        print(f"\n== {scale}x corpus: {counts['exams']} exams, {counts['pages']} pages, {counts['rects']} rects "
+              f"(generated in {time.perf_counter() - t0:.1f}s)")
+        point_modules_at(root)
+        questions = bsd.build_questions()
+        n_questions = len(questions)
+        annotations = ia.load_annotations()
+
+        def record(name, fn, items, unit, repeat=repeat):
+            seconds, peak = measure(fn, repeat)
+            results[name] = {"seconds": round(seconds, 6), "items": items,
+                             "per_sec": round(items / seconds, 1) if seconds else None,
+                             "peak_mb": round(peak / 1e6, 2)}
+            print(f"  {name:<28} {seconds * 1000:10.2f} ms  {items / seconds if seconds else 0:12.1f} {unit}/s"
+                  f"  peak {peak / 1e6:8.2f} MB")
+
+        # Build phases
+        record("build_questions", bsd.build_questions, n_questions, "questions")
+        record("build_reference", bsd.build_reference, scale, "copies")
+        record("cluster_questions", bsd.cluster_questions, n_questions, "questions")
+        record("build_full", quiet(bsd.main, ["--force", "--no-image-variants"]), n_questions, "questions", 1)
+        record("build_noop", quiet(bsd.main, ["--no-image-variants"]), n_questions, "questions")
+
+        index = search_index.load_index(bsd.SEARCH_FILE)
+        queries = ["pedestrian crossing", "traffic light yellow", "overtak", "railroad"]
+        record("search_query", lambda: [search_index.search(index, q) for q in queries], len(queries), "queries")
+
+        # Study scheduler: picks should cost the same at any deck size
+        sched = scheduler.Scheduler(questions, rng=random.Random(0))
+
+        def study():
+            for _ in range(STUDY_STEPS):
+                qid = sched.next()
+                sched.answer(qid, sched.rng.random() < 0.7)
+
+        record("scheduler_pick", study, STUDY_STEPS, "answers")
+
+        # Annotator phases
+        def process_cold():
+            if os.path.exists(ia.CROPS_FILE):
+                os.remove(ia.CROPS_FILE)
+            quiet(ia.process_annotations, annotations)()
+
+        record("process_annotations_cold", process_cold, counts["rects"], "crops", 1)
+        record("process_annotations_warm", quiet(ia.process_annotations, annotations), counts["rects"], "crops")
+
+        def pages_cold():
+            point_modules_at(root)
+            ia.get_pages_data()
+
+        record("get_pages_data_cold", pages_cold, counts["pages"], "pages")
+        record("get_pages_data_warm", ia.get_pages_data, counts["pages"], "pages")
+
+        # Crop suggestions for the original pages (copies share a page hash, so would hit the cache)
+        originals = sorted(_load(os.path.join(SRC_EXTRACTED, "image_annotations.json")))
+
+        def suggest_cold():
+            ia._region_cache.clear()
+            shutil.rmtree(ia.PAGE_CACHE_DIR, ignore_errors=True)
+            for page in originals:
+                ia.suggest_crops(page)
+
+        record("suggest_crops_cold", suggest_cold, len(originals), "pages", 1)
+        record("suggest_crops_warm", lambda: [ia.suggest_crops(p) for p in originals], len(originals), "pages")
+
+        # Handler endpoints over HTTP
+        client = _Client()
+        try:
+            page = sorted(annotations)[0]
+            etag = ia.get_pages_payload()["etag"]
+            op = json.dumps({"ops": [{"page": page, "tag": "bench_tag",
+                                      "ann": {"x1": 1, "y1": 1, "x2": 20, "y2": 20}}]})
+            endpoints = [
+                ("GET /api/pages", "GET", "/api/pages", None, {}),
+                ("GET /api/pages (304)", "GET", "/api/pages", None, {"If-None-Match": etag}),
+                ("GET /api/annotations", "GET", "/api/annotations", None, {}),
+                ("GET /api/metrics", "GET", "/api/metrics", None, {}),
+                ("GET /api/suggest", "GET", f"/api/suggest?page={page}", None, {}),
+                ("GET /images/<page>", "GET", f"/images/{page}", None, {}),
+                ("PATCH /api/annotations", "PATCH", "/api/annotations", op, {}),
+            ]
+            for name, method, path, req_body, headers in endpoints:
+                def hit(method=method, path=path, req_body=req_body, headers=headers):
+                    for _ in range(endpoint_requests):
+                        client.request(method, path, req_body, headers)
+                record(name, hit, endpoint_requests, "req")
+        finally:
+            client.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline):
+    regressions = []
+    for scale, phases in results.items():
+        for name, r in phases.items():
+            base = baseline.get(scale, {}).get(name)
+            if not base or not base["seconds"]:
+                continue
+            change = r["seconds"] / base["seconds"] - 1
+            if change > REGRESSION_THRESHOLD and r["seconds"] - base["seconds"] > REGRESSION_MIN_SECONDS:
+                regressions.append(f"  {scale}x {name}: {base['seconds'] * 1000:.2f} ms -> "
+                                   f"{r['seconds'] * 1000:.2f} ms ({change:+.0%})")
+    if regressions:
+        print(f"\nRegressions (> {REGRESSION_THRESHOLD:.0%} slower than {BASELINE_FILE}):")
+        print("\n".join(regressions))
+    else:
+        print(f"\nNo regressions against {BASELINE_FILE}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the site build and annotator server.")
+    parser.add_argument("--scales", default="1,10", help="comma-separated corpus scales (default: 1,10)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per phase; the best is kept")
+    parser.add_argument("--requests", type=int, default=50, help="HTTP requests per endpoint phase")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE_FILE}")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for scale in (int(s) for s in args.scales.split(",")):
+        results[str(scale)] = run_scale(scale, args.repeat, args.requests)
+
+    if args.json:
+        _dump(args.json, results)
+    regressions = []
+    if args.save_baseline:
+        baseline = _load(BASELINE_FILE) if os.path.exists(BASELINE_FILE) else {}
+        baseline.update(results)
+        _dump(BASELINE_FILE, baseline)
+        print(f"\nSaved baseline for scales {', '.join(results)} to {BASELINE_FILE}")
+    elif os.path.exists(BASELINE_FILE):
+        regressions = compare(results, _load(BASELINE_FILE))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
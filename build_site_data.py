@@ -1,11 +1,27 @@
 #!/usr/bin/env python3
 """Build docs/ site data from extracted exam JSONs and images."""
 
+import argparse
+import array
+import collections
+import contextlib
+import gzip
+import hashlib
+import itertools
 import json
 import os
 import re
 import shutil
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import search_index
 
 EXTRACTED = "extracted"
 DOCS = "docs"
@@ -13,6 +29,58 @@ DATA_DIR = os.path.join(DOCS, "data")
 IMG_DIR = os.path.join(DOCS, "images")
 SRC_IMG_DIR = os.path.join(EXTRACTED, "question_images")
 
+# Exam files are discovered as <kind>_exam_<n>.json; each kind maps to its id/source prefix
+EXAM_KINDS = {"learners_permit": "lp", "drivers_license": "dl"}
+EXAM_FILE_RE = re.compile(r"^(%s)_exam_(\d+)\.json$" % "|".join(EXAM_KINDS))
+PARALLEL_MIN_EXAMS = 16  # below this many exams a process pool costs more than it saves
+
+# Near-duplicate detection: MinHash over stemmed words and word pairs, LSH with
+# bands of rows. 30 bands x 4 rows catches pairs at the threshold with ~95%
+# probability. The bundled exams phrase many different rules from the same
+# template ("The traffic sign shown on the right indicates ..."), so candidates
+# must also agree on the answer, every number and colour word, and come from
+# different exams; at 0.56 that keeps only true rewordings of one rule.
+MINHASH_BANDS = 30
+MINHASH_ROWS = 4
+DUPLICATE_JACCARD = 0.56
+COLOUR_WORDS = frozenset({"red", "yellow", "green", "blue", "white", "black", "orange"})
+
+# Records source/output content hashes between runs so unchanged work is skipped.
+MANIFEST_FILE = ".build_manifest.json"
+MANIFEST_VERSION = 1
+# Per-phase timings and bytes written by the last run, for scripts and CI
+BUILD_REPORT_FILE = ".build_report.json"
+BUILD_REPORT_VERSION = 1
+WATCH_INTERVAL = 0.5  # seconds between polls in --watch mode
+
+# Bytes and files written so far this run; build_phase() records the difference per phase
+IO_COUNTERS = {"bytes_written": 0, "files_written": 0}
+
+# Minified, precompressed question shards and the manifest the client loads first
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
+BUNDLES_FILE = os.path.join(DATA_DIR, "bundles.json")
+INDEX_FILE = os.path.join(DATA_DIR, "index.json")
+SEARCH_FILE = os.path.join(DATA_DIR, "search.json")
+# Persistent id -> integer slot registry; slots index the client's packed progress store
+SLOTS_FILE = os.path.join(EXTRACTED, "question_slots.json")
+CATEGORIES = {
+    "lp": lambda q: q["source"].startswith("lp"),
+    "dl": lambda q: q["type"] == "standard" and q["source"].startswith("dl"),
+    "danger": lambda q: q["type"] == "danger",
+}
+
+# Optimized image variants (WebP, optional AVIF) written next to the PNG copies
+OPT_IMG_DIR = os.path.join(IMG_DIR, "opt")
+VARIANT_WIDTHS = (320, 640, 1280)
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+
+# Offline support: docs/sw.js precaches what precache-manifest.json lists
+SW_FILE = os.path.join(DOCS, "sw.js")
+PRECACHE_FILE = os.path.join(DOCS, "precache-manifest.json")
+SHELL_FILES = ("index.html", "app.js", "style.css")
+OFFLINE_IMAGE_WIDTH = 640  # variant cached for offline use: covers the 568px column at 1x
+
 
 def rewrite_image_path(path):
     """Rewrite 'question_images/X' to 'images/X'."""
@@ -26,71 +94,353 @@ def load_json(path):
         return json.load(f)
 
 
-def build_questions():
-    questions = []
+def exam_files():
+    """Exam JSONs in extracted/ that feed questions.json, in build order (kind, then number)."""
+    kinds = list(EXAM_KINDS)
+    found = []
+    for fname in os.listdir(EXTRACTED):
+        m = EXAM_FILE_RE.match(fname)
+        if m:
+            found.append((kinds.index(m.group(1)), int(m.group(2)), os.path.join(EXTRACTED, fname)))
+    return [path for _, _, path in sorted(found)]
+
+
+def exam_source(path):
+    """'extracted/drivers_license_exam_3.json' -> 'dl3'."""
+    m = EXAM_FILE_RE.match(os.path.basename(path))
+    return f"{EXAM_KINDS[m.group(1)]}{int(m.group(2))}"
+
+
+# --- Build manifest ---
+
+def load_manifest(force=False):
+    """Load the build manifest, or start an empty one when forced/missing/stale."""
+    empty = {"version": MANIFEST_VERSION, "files": {}, "steps": {}}
+    if force or not os.path.exists(MANIFEST_FILE):
+        empty["builder"] = file_digest(__file__, empty)
+        return empty
+    try:
+        manifest = load_json(MANIFEST_FILE)
+    except (OSError, ValueError):
+        return empty
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty
+    manifest.setdefault("files", {})
+    manifest.setdefault("steps", {})
+    # Any change to this script invalidates every step's recorded result
+    builder = file_digest(__file__, manifest)
+    if manifest.get("builder") != builder:
+        manifest["steps"] = {}
+    manifest["builder"] = builder
+    return manifest
+
+
+def save_manifest(manifest):
+    write_bytes_atomic(MANIFEST_FILE, json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+
+
+def file_digest(path, manifest):
+    """SHA-256 of a file, reusing the manifest entry while size and mtime are unchanged."""
+    st = os.stat(path)
+    entry = manifest["files"].get(path)
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["sha256"]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    manifest["files"][path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    return digest
 
-    # Learner's Permit exams 1-5
-    for i in range(1, 6):
-        data = load_json(os.path.join(EXTRACTED, f"learners_permit_exam_{i}.json"))
-        source = f"lp{i}"
-        for q in data["questions"]:
-            questions.append({
-                "id": f"{source}_q{q['number']:02d}",
-                "source": source,
-                "type": "standard",
-                "text": q["text"],
-                "has_image": q["has_image"],
-                "image_file": rewrite_image_path(q["image_file"]),
-                "correct_answer": q["correct_answer"],
-                "explanation": q["explanation"],
-            })
 
-    # Driver's License exams 1-6
-    for i in range(1, 7):
-        data = load_json(os.path.join(EXTRACTED, f"drivers_license_exam_{i}.json"))
-        source = f"dl{i}"
-        # Standard true/false questions
-        for q in data["questions"]:
+def digest_files(paths, manifest):
+    """Combined digest over a set of files (name + content)."""
+    h = hashlib.sha256()
+    for path in sorted(paths):
+        h.update(path.encode("utf-8"))
+        h.update(file_digest(path, manifest).encode("ascii") if os.path.exists(path) else b"-")
+    return h.hexdigest()
+
+
+def count_written(nbytes, files=1):
+    IO_COUNTERS["bytes_written"] += nbytes
+    IO_COUNTERS["files_written"] += files
+
+
+def write_bytes_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    count_written(len(data))
+
+
+def write_if_changed(path, data, manifest):
+    """Write bytes to path unless it already holds identical content. Returns True if written."""
+    if os.path.exists(path) and file_digest(path, manifest) == hashlib.sha256(data).hexdigest():
+        return False
+    write_bytes_atomic(path, data)
+    manifest["files"].pop(path, None)
+    file_digest(path, manifest)
+    return True
+
+
+def step_is_fresh(manifest, step, key, outputs):
+    """True if a step ran with the same input key and its outputs are untouched since."""
+    prev = manifest["steps"].get(step)
+    if not prev or prev["key"] != key:
+        return False
+    for path, digest in prev["outputs"].items():
+        if path not in outputs or not os.path.exists(path) or file_digest(path, manifest) != digest:
+            return False
+    return True
+
+
+def record_step(manifest, step, key, outputs):
+    manifest["steps"][step] = {
+        "key": key,
+        "outputs": {path: file_digest(path, manifest) for path in outputs},
+    }
+
+
+@contextlib.contextmanager
+def build_phase(report, name):
+    """Time one build step and count the bytes and files it wrote.
+
+    Yields the phase's report entry so the step can add its own fields
+    (e.g. "skipped" when the manifest says it is up to date).
+    """
+    entry = {"name": name}
+    before = dict(IO_COUNTERS)
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry["seconds"] = round(time.perf_counter() - start, 6)
+        for key, value in IO_COUNTERS.items():
+            entry[key] = value - before[key]
+        report["phases"].append(entry)
+
+
+def write_build_report(report, path, stdout=None):
+    report["seconds"] = round(sum(p["seconds"] for p in report["phases"]), 6)
+    for key in IO_COUNTERS:
+        report[key] = sum(p[key] for p in report["phases"])
+    data = json.dumps(report, indent=2).encode("utf-8") + b"\n"
+    if path == "-":
+        (stdout or sys.stdout).write(data.decode("utf-8"))
+    else:
+        with open(path, "wb") as f:
+            f.write(data)
+    print("Timing: " + ", ".join(f"{p['name']} {p['seconds']:.2f}s" for p in report["phases"])
+          + f" ({report['seconds']:.2f}s, {report['bytes_written'] / 1e6:.2f} MB written)")
+
+
+def attach_variants(record, variants):
+    """Add an image_variants entry next to a record's image_file, if one was generated."""
+    if variants and record.get("image_file"):
+        info = variants.get(os.path.basename(record["image_file"]))
+        if info:
+            record["image_variants"] = info
+
+
+def parse_exam(path, variants=None):
+    """Flatten one exam JSON into question records. Runs in pool workers for large builds."""
+    data = load_json(path)
+    source = exam_source(path)
+    questions = []
+
+    # Standard true/false questions
+    for q in data["questions"]:
+        questions.append({
+            "id": f"{source}_q{q['number']:02d}",
+            "source": source,
+            "type": "standard",
+            "text": q["text"],
+            "has_image": q["has_image"],
+            "image_file": rewrite_image_path(q["image_file"]),
+            "correct_answer": q["correct_answer"],
+            "explanation": q["explanation"],
+        })
+    # Danger anticipation questions -> flatten sub-questions
+    for dq in data.get("danger_questions", []):
+        for sq in dq["sub_questions"]:
             questions.append({
-                "id": f"{source}_q{q['number']:02d}",
+                "id": f"{source}_q{dq['number']:02d}_{sq['number']}",
                 "source": source,
-                "type": "standard",
-                "text": q["text"],
-                "has_image": q["has_image"],
-                "image_file": rewrite_image_path(q["image_file"]),
-                "correct_answer": q["correct_answer"],
-                "explanation": q["explanation"],
+                "type": "danger",
+                "scenario": dq["scenario"],
+                "text": sq["text"],
+                "has_image": dq.get("has_image", False),
+                "image_file": rewrite_image_path(dq.get("image_file")),
+                "correct_answer": sq["correct_answer"],
+                "explanation": sq["explanation"],
             })
-        # Danger anticipation questions -> flatten sub-questions
-        for dq in data.get("danger_questions", []):
-            for sq in dq["sub_questions"]:
-                questions.append({
-                    "id": f"{source}_q{dq['number']:02d}_{sq['number']}",
-                    "source": source,
-                    "type": "danger",
-                    "scenario": dq["scenario"],
-                    "text": sq["text"],
-                    "has_image": dq.get("has_image", False),
-                    "image_file": rewrite_image_path(dq.get("image_file")),
-                    "correct_answer": sq["correct_answer"],
-                    "explanation": sq["explanation"],
-                })
 
+    for q in questions:
+        attach_variants(q, variants)
     return questions
 
 
-def build_reference():
+def map_exams(fn, *args, jobs=None):
+    """Yield fn(path, *args) for each exam in build order.
+
+    With many exams the calls run across a process pool, keeping only a
+    bounded window of results in memory at once.
+    """
+    files = exam_files()
+    if len(files) < PARALLEL_MIN_EXAMS:
+        for path in files:
+            yield fn(path, *args)
+        return
+
+    workers = jobs or os.cpu_count() or 1
+    remaining = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = collections.deque(pool.submit(fn, path, *args)
+                                   for path in itertools.islice(remaining, 2 * workers))
+        while window:
+            result = window.popleft().result()
+            for path in itertools.islice(remaining, 1):
+                window.append(pool.submit(fn, path, *args))
+            yield result
+
+
+def iter_questions(variants=None, jobs=None):
+    """Yield question records exam by exam, in build order."""
+    for records in map_exams(parse_exam, variants, jobs=jobs):
+        yield from records
+
+
+def build_questions(variants=None):
+    return list(iter_questions(variants))
+
+
+# --- Near-duplicate clustering ---
+
+def minhash_signature(terms, cache):
+    """MinHash of a term set: per hash function, the minimum over the terms.
+
+    Each term gets MINHASH_BANDS * MINHASH_ROWS independent 32-bit hashes from
+    a single shake_128 digest (memoized in `cache`).
+    """
+    rows = []
+    for term in terms:
+        h = cache.get(term)
+        if h is None:
+            h = cache[term] = array.array(
+                "I", hashlib.shake_128(term.encode("utf-8")).digest(4 * MINHASH_BANDS * MINHASH_ROWS))
+        rows.append(h)
+    return tuple(map(min, zip(*rows))) if rows else None
+
+
+_term_hashes = {}  # per process; the vocabulary is shared across exams
+
+
+def duplicate_features(q):
+    """(shingles, facts) of a question: its stemmed words and adjacent word
+    pairs, and what a rewording of it must keep (source exam aside)."""
+    words = search_index.tokenize(q["text"])
+    shingles = frozenset(words) | frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+    raw = set(search_index.TOKEN_RE.findall(q["text"].lower()))
+    facts = (q["correct_answer"], frozenset(w for w in raw if any(c.isdigit() for c in w)),
+             frozenset(raw & COLOUR_WORDS))
+    return shingles, facts
+
+
+def exam_minhashes(path):
+    """Worker: (id, source, shingles, facts, signature) for each question in one exam."""
+    result = []
+    for q in parse_exam(path):
+        shingles, facts = duplicate_features(q)
+        result.append((q["id"], q["source"], shingles, facts, minhash_signature(shingles, _term_hashes)))
+    return result
+
+
+def cluster_questions(jobs=None):
+    """Group reworded variants of the same question in roughly linear time.
+
+    Signatures are split into MINHASH_BANDS bands; questions sharing any band
+    are candidates, and candidates from different exams with the same facts
+    (see duplicate_features) whose shingle sets have Jaccard similarity >=
+    DUPLICATE_JACCARD are merged (union-find). Returns
+    {question id: cluster id}, where the cluster id is the id of the cluster's
+    first question in build order (its own id for questions without
+    duplicates).
+    """
+    ids, sources, term_sets, facts = [], [], [], []
+    parent = []
+    first_with_terms = {}
+    buckets = {}
+    for result in map_exams(exam_minhashes, jobs=jobs):
+        for qid, source, terms, doc_facts, sig in result:
+            doc = len(ids)
+            ids.append(qid)
+            sources.append(source)
+            term_sets.append(terms)
+            facts.append(doc_facts)
+            # Exact copies join the first question with the same words and facts and skip the buckets
+            parent.append(first_with_terms.setdefault((terms, doc_facts), doc))
+            if sig is None or parent[doc] != doc:
+                continue
+            for b in range(MINHASH_BANDS):
+                buckets.setdefault((b, sig[b * MINHASH_ROWS:(b + 1) * MINHASH_ROWS]), []).append(doc)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for docs in buckets.values():
+        # Compare each member with one representative per cluster already in the bucket,
+        # so exact copies cost a single comparison each rather than one per pair
+        reps = []
+        for b in docs:
+            for a in reps:
+                ra, rb = find(a), find(b)
+                if ra == rb:
+                    break
+                if facts[a] != facts[b] or sources[a] == sources[b]:
+                    continue
+                union = len(term_sets[a] | term_sets[b])
+                if len(term_sets[a] & term_sets[b]) >= DUPLICATE_JACCARD * union:
+                    # The lower position becomes the root, so roots are each cluster's first question
+                    parent[max(ra, rb)] = min(ra, rb)
+                    break
+            else:
+                reps.append(b)
+
+    return {qid: ids[find(doc)] for doc, qid in enumerate(ids)}
+
+
+def report_clusters(clusters, elapsed, verbose=False):
+    members = collections.defaultdict(list)
+    for qid, cid in clusters.items():
+        members[cid].append(qid)
+    dups = [m for m in members.values() if len(m) > 1]
+    print(f"Clustered {len(clusters)} questions in {elapsed * 1000:.0f} ms: {len(dups)} near-duplicate "
+          f"clusters covering {sum(map(len, dups))} questions (largest {max(map(len, dups), default=0)})")
+    if verbose:
+        for m in sorted(dups, key=len, reverse=True):
+            print(f"  {', '.join(m)}")
+
+
+def build_reference(variants=None):
     ref = load_json(os.path.join(EXTRACTED, "reference_material.json"))
     # Rewrite image paths in reference material
     for section in ref["key_points_to_remember"]["sections"]:
         if "image_file" in section and section["image_file"]:
             section["image_file"] = rewrite_image_path(section["image_file"])
+            attach_variants(section, variants)
         if "points" in section:
             new_points = []
             for point in section["points"]:
                 if isinstance(point, dict):
                     if point.get("image_file"):
                         point["image_file"] = rewrite_image_path(point["image_file"])
+                        attach_variants(point, variants)
                     new_points.append(point)
                 else:
                     new_points.append(point)
@@ -100,43 +450,670 @@ def build_reference():
         guide = ref["anticipating_danger_guide"]
         if guide.get("image_file"):
             guide["image_file"] = rewrite_image_path(guide["image_file"])
+            attach_variants(guide, variants)
     return ref
 
 
-def main():
+def dump_json(data):
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def dump_json_min(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def write_precompressed(path, data, manifest):
+    """Write data plus .gz (and .br when brotli is installed) siblings. Returns written paths."""
+    outputs = [path, path + ".gz"]
+    write_if_changed(path, data, manifest)
+    write_if_changed(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0), manifest)
+    if brotli is not None:
+        write_if_changed(path + ".br", brotli.compress(data, quality=11), manifest)
+        outputs.append(path + ".br")
+    return outputs
+
+
+class StreamedFile:
+    """Build output written incrementally to temp files and hashed on the way.
+
+    close() only replaces the target (and its .gz/.br siblings when precompress
+    is set) if the content hash changed, so unchanged outputs keep their mtime.
+    """
+
+    def __init__(self, path, manifest, precompress=False):
+        self.path = path
+        self.manifest = manifest
+        self.sha = hashlib.sha256()
+        self.size = 0
+        self.files = [(path + ".tmp", path)]
+        self.raw = open(path + ".tmp", "wb")
+        self.gz = self.br = None
+        if precompress:
+            self.gz_raw = open(path + ".gz.tmp", "wb")
+            self.gz = gzip.GzipFile(filename="", mode="wb", compresslevel=9, fileobj=self.gz_raw, mtime=0)
+            self.files.append((path + ".gz.tmp", path + ".gz"))
+            if brotli is not None:
+                self.br_raw = open(path + ".br.tmp", "wb")
+                self.br = brotli.Compressor(quality=11)
+                self.files.append((path + ".br.tmp", path + ".br"))
+
+    def write(self, data):
+        self.sha.update(data)
+        self.size += len(data)
+        self.raw.write(data)
+        if self.gz:
+            self.gz.write(data)
+        if self.br:
+            self.br_raw.write(self.br.process(data))
+
+    @property
+    def digest(self):
+        return self.sha.hexdigest()
+
+    def close(self):
+        """Finish the output. Returns True if the target content changed."""
+        self.raw.close()
+        if self.gz:
+            self.gz.close()
+            self.gz_raw.close()
+        if self.br:
+            self.br_raw.write(self.br.finish())
+            self.br_raw.close()
+        changed = not (os.path.exists(self.path) and file_digest(self.path, self.manifest) == self.digest)
+        for tmp, final in self.files:
+            if changed or not os.path.exists(final):
+                os.replace(tmp, final)
+                self.manifest["files"].pop(final, None)
+                count_written(os.path.getsize(final))
+            else:
+                os.remove(tmp)
+        file_digest(self.path, self.manifest)
+        return changed
+
+    @property
+    def outputs(self):
+        return [final for _, final in self.files]
+
+
+class JSONArrayStream:
+    """Serialize records one at a time as a JSON array, byte-identical to dumping the whole list."""
+
+    def __init__(self, out, pretty=False):
+        self.out = out
+        self.pretty = pretty
+        self.count = 0
+
+    def append(self, record):
+        if self.pretty:
+            body = json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            self.out.write((("[\n  " if self.count == 0 else ",\n  ") + body).encode("utf-8"))
+        else:
+            body = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+            self.out.write((("[" if self.count == 0 else ",") + body).encode("utf-8"))
+        self.count += 1
+
+    def close(self):
+        if self.count == 0:
+            self.out.write(b"[]")
+        else:
+            self.out.write(b"\n]" if self.pretty else b"]")
+        return self.out.close()
+
+
+def danger_group(qid):
+    """'dl1_q91_3' -> 'dl1_q91': the scenario a danger sub-question belongs to."""
+    return qid.rsplit("_", 1)[0]
+
+
+def load_slots(path=SLOTS_FILE):
+    """The slot registry as {id: slot}, in slot order.
+
+    Slots are only ever appended: a question keeps its slot across rebuilds
+    and a removed question's slot is never handed out again, so progress
+    stored by slot stays valid.
+    """
+    if not os.path.exists(path):
+        return {}
+    return {qid: slot for slot, qid in enumerate(load_json(path)["ids"])}
+
+
+def slot_for(slots, qid):
+    return slots.setdefault(qid, len(slots))
+
+
+def new_question_index():
+    """Static lookups the client would otherwise recompute with linear scans.
+
+    Filled one record at a time by add_to_index(); positions refer to the order
+    of questions.json.
+    """
+    return {
+        "total": 0,
+        "positions": {},
+        "filters": {name: [] for name in CATEGORIES},
+        "danger_groups": {},
+        "images": [],
+        "slots": [],
+        "slot_count": 0,
+    }
+
+
+def add_to_index(index, q):
+    i = index["total"]
+    index["total"] += 1
+    index["positions"][q["id"]] = i
+    for name, pred in CATEGORIES.items():
+        if pred(q):
+            index["filters"][name].append(i)
+    if q["type"] == "danger":
+        index["danger_groups"].setdefault(danger_group(q["id"]), []).append(i)
+    if q["has_image"] and q["image_file"]:
+        index["images"].append(i)
+    index["slots"].append(q["slot"])
+
+
+def finish_question_index(index):
+    # Danger groups list sub-questions in id order
+    ids = {i: qid for qid, i in index["positions"].items()}
+    for group in index["danger_groups"].values():
+        group.sort(key=ids.__getitem__)
+    return index
+
+
+def _shard_info(stream):
+    return {
+        "file": os.path.relpath(stream.out.path, DOCS).replace(os.sep, "/"),
+        "hash": stream.out.digest[:10],
+        "count": stream.count,
+        "bytes": stream.out.size,
+    }
+
+
+def write_questions(questions_path, manifest, variants=None, jobs=None, clusters=None):
+    """Stream questions.json, per-category shards, the question index, and
+    data/bundles.json describing them, in a single pass over the exams.
+
+    Only the index (ids and positions) grows with the corpus; question records
+    are written out as they are parsed. Returns (count, questions.json changed,
+    every path written).
+    """
+    os.makedirs(SHARD_DIR, exist_ok=True)
+
+    def shard(name):
+        return JSONArrayStream(StreamedFile(os.path.join(SHARD_DIR, f"{name}.json"), manifest, precompress=True))
+
+    full = JSONArrayStream(StreamedFile(questions_path, manifest), pretty=True)
+    categories = {name: shard(name) for name in CATEGORIES}
+    index = new_question_index()
+    slots = load_slots()
+
+    for q in iter_questions(variants, jobs):
+        if clusters:
+            q["cluster_id"] = clusters[q["id"]]
+        q["slot"] = slot_for(slots, q["id"])
+        full.append(q)
+        for name, pred in CATEGORIES.items():
+            if pred(q):
+                categories[name].append(q)
+        add_to_index(index, q)
+
+    changed = full.close()
+    outputs = list(full.out.outputs)
+    for stream in categories.values():
+        stream.close()
+    bundles = {"total": index["total"], "categories": {}}
+    for name, stream in categories.items():
+        bundles["categories"][name] = _shard_info(stream)
+        outputs += stream.out.outputs
+
+    write_if_changed(SLOTS_FILE, dump_json({"ids": list(slots)}), manifest)
+    outputs.append(SLOTS_FILE)
+    index["slot_count"] = len(slots)  # retired slots included: progress arrays are sized by it
+    data = dump_json_min(finish_question_index(index))
+    outputs += write_precompressed(INDEX_FILE, data, manifest)
+    bundles["index"] = {
+        "file": os.path.relpath(INDEX_FILE, DOCS).replace(os.sep, "/"),
+        "hash": hashlib.sha256(data).hexdigest()[:10],
+        "bytes": len(data),
+    }
+    outputs += write_precompressed(BUNDLES_FILE, dump_json_min(bundles), manifest)
+
+    # Drop shards that are no longer written (e.g. removed categories)
+    for fname in os.listdir(SHARD_DIR):
+        path = os.path.join(SHARD_DIR, fname)
+        if path not in outputs:
+            os.remove(path)
+            manifest["files"].pop(path, None)
+    return index["total"], changed, outputs
+
+
+def link_images(manifest):
+    """Hard-link the image store's PNGs into docs/images and drop files whose source is gone.
+
+    Store files are content-addressed and never modified in place, so sharing
+    them is safe. Falls back to copying where hard links are not supported
+    (e.g. across filesystems).
+    """
+    prev = manifest["steps"].get("images", {}).get("outputs", {})
+    linked, unchanged, removed = 0, 0, 0
+    outputs = {}
+    if os.path.isdir(SRC_IMG_DIR):
+        for fname in sorted(os.listdir(SRC_IMG_DIR)):
+            if not fname.endswith(".png"):
+                continue
+            src = os.path.join(SRC_IMG_DIR, fname)
+            dst = os.path.join(IMG_DIR, fname)
+            digest = file_digest(src, manifest)
+            if os.path.exists(dst) and os.path.samefile(src, dst):
+                unchanged += 1
+            else:
+                # A fresh checkout has separate copies; relinking them frees the duplicate
+                try:
+                    os.link(src, dst + ".tmp")
+                    os.replace(dst + ".tmp", dst)
+                except OSError:
+                    if os.path.exists(dst) and file_digest(dst, manifest) == digest:
+                        unchanged += 1
+                        outputs[dst] = digest
+                        continue
+                    shutil.copy2(src, dst)
+                    count_written(os.path.getsize(dst))
+                manifest["files"].pop(dst, None)
+                file_digest(dst, manifest)
+                linked += 1
+            outputs[dst] = digest
+    # Every PNG directly in docs/images comes from the store, so anything else is stale
+    stale = {os.path.join(IMG_DIR, f) for f in os.listdir(IMG_DIR) if f.endswith(".png")} | set(prev)
+    for dst in sorted(stale - set(outputs)):
+        if os.path.exists(dst):
+            os.remove(dst)
+            manifest["files"].pop(dst, None)
+            removed += 1
+    manifest["steps"]["images"] = {"key": None, "outputs": outputs}
+    return linked, unchanged, removed
+
+
+# --- Image optimization ---
+
+def _save_variant(img, stem, label, fmt, quality):
+    ext = "webp" if fmt == "WEBP" else "avif"
+    fname = f"{stem}-{label}.{ext}"
+    path = os.path.join(OPT_IMG_DIR, fname)
+    if fmt == "WEBP":
+        img.save(path, fmt, quality=quality, method=6)
+    else:
+        img.save(path, fmt, quality=quality)
+    return {
+        "file": f"images/opt/{fname}",
+        "type": f"image/{ext}",
+        "width": img.width,
+        "height": img.height,
+    }, os.path.getsize(path)
+
+
+def canonical_variant_info(info):
+    """Variant info in one key order, whether fresh or read back from the sorted manifest.
+
+    The data files are written in insertion order, so this keeps their bytes
+    (and the client cache hashes) identical across forced and incremental builds.
+    """
+    return {
+        "width": info["width"],
+        "height": info["height"],
+        "variants": [{key: v[key] for key in ("file", "type", "width", "height")} for v in info["variants"]],
+    }
+
+
+def optimize_image(src, avif=False):
+    """Worker: write WebP (and AVIF) variants for one PNG.
+
+    Returns (info, source_bytes, largest_variant_bytes, [bytes of every file
+    written]); runs in a pool process.
+    """
+    from PIL import Image
+
+    stem = os.path.splitext(os.path.basename(src))[0]
+    formats = [("WEBP", WEBP_QUALITY)] + ([("AVIF", AVIF_QUALITY)] if avif else [])
+    with Image.open(src) as im:
+        im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+        info = {"width": im.width, "height": im.height, "variants": []}
+
+        largest, written = 0, []
+        for width in VARIANT_WIDTHS:
+            target = min(width, im.width)
+            height = max(1, round(im.height * target / im.width))
+            resized = im if target == im.width else im.resize((target, height), Image.LANCZOS)
+            for fmt, quality in formats:
+                entry, size = _save_variant(resized, stem, f"{target}w", fmt, quality)
+                info["variants"].append(entry)
+                written.append(size)
+                if fmt == "WEBP":
+                    largest = size
+            if target == im.width:
+                break
+    return info, os.path.getsize(src), largest, written
+
+
+def build_image_variants(manifest, avif=False, jobs=None):
+    """Generate optimized variants for new/changed PNGs in docs/images across a process pool.
+
+    Returns {png filename: variant info}. Without Pillow, previously generated
+    variants whose source is unchanged are still reused.
+    """
+    settings = f"{VARIANT_WIDTHS}:{WEBP_QUALITY}:{AVIF_QUALITY if avif else 0}"
+    prev = manifest["steps"].get("image_variants", {})
+    cached = prev.get("images", {}) if prev.get("settings") == settings else {}
+
+    pngs = sorted(f for f in os.listdir(IMG_DIR) if f.endswith(".png")) if os.path.isdir(IMG_DIR) else []
+    images, todo = {}, []
+    for fname in pngs:
+        digest = file_digest(os.path.join(IMG_DIR, fname), manifest)
+        entry = cached.get(fname)
+        if entry and entry["source"] == digest and all(
+                os.path.exists(os.path.join(DOCS, v["file"]))
+                for v in entry["info"]["variants"]):
+            images[fname] = entry
+        else:
+            todo.append((fname, digest))
+
+    if todo:
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            print(f"Pillow not installed; skipping {len(todo)} image variants")
+            todo = []
+    if todo:
+        os.makedirs(OPT_IMG_DIR, exist_ok=True)
+        srcs = [os.path.join(IMG_DIR, fname) for fname, _ in todo]
+        total_src, total_opt = 0, 0
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = pool.map(optimize_image, srcs, [avif] * len(srcs), chunksize=4)
+            for (fname, digest), (info, src_bytes, opt_bytes, written) in zip(todo, results):
+                images[fname] = {"source": digest, "info": info}
+                count_written(sum(written), len(written))
+                total_src += src_bytes
+                total_opt += opt_bytes
+                saved = src_bytes - opt_bytes
+                print(f"  {fname}: {src_bytes / 1024:.1f} KB -> {opt_bytes / 1024:.1f} KB "
+                      f"(saved {saved / 1024:.1f} KB, {100 * saved / max(src_bytes, 1):.0f}%)")
+        print(f"Optimized {len(todo)} images: {total_src / 1e6:.1f} MB -> {total_opt / 1e6:.1f} MB")
+
+    # Remove variants belonging to images that no longer exist
+    keep = {v["file"] for e in images.values() for v in e["info"]["variants"]}
+    if os.path.isdir(OPT_IMG_DIR):
+        for fname in os.listdir(OPT_IMG_DIR):
+            if f"images/opt/{fname}" not in keep:
+                os.remove(os.path.join(OPT_IMG_DIR, fname))
+
+    manifest["steps"]["image_variants"] = {"settings": settings, "images": images}
+    return {fname: canonical_variant_info(entry["info"]) for fname, entry in images.items()}
+
+
+def bump_cache_version(manifest):
+    """Set each ?v= token in index.html to a content hash of the asset it references."""
+    index_path = os.path.join(DOCS, "index.html")
+    with open(index_path, "r", encoding="utf-8") as f:
+        html = f.read()
+
+    def repl(m):
+        asset = os.path.join(DOCS, m.group(2))
+        if not os.path.exists(asset):
+            return m.group(0)
+        return f'{m.group(1)}?v={file_digest(asset, manifest)[:10]}'
+
+    html = re.sub(r'((?:href|src)="([^"?]+))\?v=\w+', repl, html)
+    return write_if_changed(index_path, html.encode("utf-8"), manifest)
+
+
+def offline_image(fname, info):
+    """The one file per source image the service worker fetches ahead of time."""
+    webp = sorted((v for v in info["variants"] if v["type"] == "image/webp"), key=lambda v: v["width"]) if info else []
+    if not webp:
+        return f"images/{fname}"
+    return next((v for v in webp if v["width"] >= OFFLINE_IMAGE_WIDTH), webp[-1])["file"]
+
+
+def write_precache_manifest(manifest, variants):
+    """Write precache-manifest.json and stamp its version into sw.js.
+
+    core (app shell and the data files app.js fetches, so not questions.json)
+    is precached on install. Images are cached on first view, and `warm` (one
+    file per image, see offline_image) is fetched in the background. `offline`
+    maps every other image file to its warm copy.
+    Each entry carries a content hash, so a rebuild only refetches what changed.
+    """
+    def rel(path):
+        return os.path.relpath(path, DOCS).replace(os.sep, "/")
+
+    def hashes(paths):
+        return {rel(p): file_digest(p, manifest)[:10] for p in sorted(paths)}
+
+    data_files = [BUNDLES_FILE, INDEX_FILE, SEARCH_FILE, os.path.join(DATA_DIR, "reference.json")]
+    data_files += [os.path.join(SHARD_DIR, f"{name}.json") for name in CATEGORIES]
+    image_files = [os.path.join(root, f) for root, _, files in os.walk(IMG_DIR)
+                   for f in files if f.endswith((".png", ".webp", ".avif"))]
+    precache = {
+        "core": hashes([os.path.join(DOCS, f) for f in SHELL_FILES] + data_files),
+        "images": hashes(image_files),
+        "warm": [],
+        "offline": {},
+    }
+    pngs = sorted(f for f in os.listdir(IMG_DIR) if f.endswith(".png")) if os.path.isdir(IMG_DIR) else []
+    for fname in pngs:
+        info = variants.get(fname)
+        warm = offline_image(fname, info)
+        precache["warm"].append(warm)
+        group = [f"images/{fname}"] + ([v["file"] for v in info["variants"]] if info else [])
+        for url in group:
+            if url != warm:
+                precache["offline"][url] = warm
+
+    precache["version"] = hashlib.sha256(json.dumps(precache, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+    written = write_if_changed(PRECACHE_FILE, dump_json_min(precache), manifest)
+
+    with open(SW_FILE, "r", encoding="utf-8") as f:
+        sw = f.read()
+    sw = re.sub(r'^const PRECACHE_VERSION = "\w*";', f'const PRECACHE_VERSION = "{precache["version"]}";', sw, flags=re.M)
+    written = write_if_changed(SW_FILE, sw.encode("utf-8"), manifest) or written
+    return precache, written
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--force", action="store_true",
+                        help="ignore the build manifest and rebuild every output")
+    parser.add_argument("--no-image-variants", action="store_true",
+                        help="skip the WebP/AVIF image optimization stage")
+    parser.add_argument("--avif", action="store_true",
+                        help="also emit AVIF variants (needs Pillow with AVIF support)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="worker processes for image optimization and exam parsing (default: CPU count)")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="list every near-duplicate question cluster")
+    parser.add_argument("--report", default=BUILD_REPORT_FILE, metavar="PATH",
+                        help=f"where to write per-phase timings as JSON, - for stdout (default: {BUILD_REPORT_FILE})")
+    parser.add_argument("--watch", action="store_true",
+                        help="after building, poll extracted/ and the app shell and rebuild on changes")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL,
+                        help=f"seconds between polls in --watch mode (default: {WATCH_INTERVAL})")
+    return parser
+
+
+def build(args):
+    """One build. Every step is skipped or written incrementally via the manifest; returns the report."""
+    if args.report != "-":
+        return _build(args)
+    # --report -: stdout carries only the JSON report, so progress lines go to stderr
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        return _build(args, stdout)
+
+
+def _build(args, report_stdout=None):
     os.makedirs(DATA_DIR, exist_ok=True)
     os.makedirs(IMG_DIR, exist_ok=True)
+    manifest = load_manifest(force=args.force)
+    report = {"version": BUILD_REPORT_VERSION, "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+              "forced": args.force, "phases": []}
+
+    # Link images
+    with build_phase(report, "images") as phase:
+        linked, unchanged, removed = link_images(manifest)
+        phase.update(linked=linked, unchanged=unchanged, removed=removed)
+    print(f"Linked {linked} images into {IMG_DIR}/ ({unchanged} unchanged, {removed} removed)")
+
+    # Optimized image variants, referenced from the data files below
+    with build_phase(report, "image_variants") as phase:
+        variants = {} if args.no_image_variants else build_image_variants(manifest, args.avif, args.jobs)
+        phase.update(skipped=args.no_image_variants, images=len(variants))
+    variants_key = hashlib.sha256(json.dumps(variants, sort_keys=True).encode("utf-8")).hexdigest()
 
     # Build and write questions.json
-    questions = build_questions()
-    with open(os.path.join(DATA_DIR, "questions.json"), "w", encoding="utf-8") as f:
-        json.dump(questions, f, ensure_ascii=False, indent=2)
-    print(f"Wrote {len(questions)} questions to {DATA_DIR}/questions.json")
+    with build_phase(report, "questions") as phase:
+        questions_path = os.path.join(DATA_DIR, "questions.json")
+        key = digest_files(exam_files() + [search_index.__file__], manifest) + variants_key
+        prev_outputs = manifest["steps"].get("questions", {}).get("outputs", {})
+        phase["skipped"] = step_is_fresh(manifest, "questions", key, list(prev_outputs)) and not args.duplicates
+        if phase["skipped"]:
+            print(f"{DATA_DIR}/questions.json and shards are up to date")
+        else:
+            start = time.perf_counter()
+            clusters = cluster_questions(args.jobs)
+            phase["cluster_seconds"] = round(time.perf_counter() - start, 6)
+            report_clusters(clusters, phase["cluster_seconds"], verbose=args.duplicates)
+            count, written, outputs = write_questions(questions_path, manifest, variants, args.jobs, clusters)
+            record_step(manifest, "questions", key, outputs)
+            phase["questions"] = count
+            print(f"{'Wrote' if written else 'Unchanged'}: {count} questions from "
+                  f"{len(exam_files())} exams in {DATA_DIR}/questions.json")
+            print(f"Wrote {len(outputs) - 1} shard/manifest files to {SHARD_DIR}/ and {BUNDLES_FILE}")
 
     # Build and write reference.json
-    ref = build_reference()
-    with open(os.path.join(DATA_DIR, "reference.json"), "w", encoding="utf-8") as f:
-        json.dump(ref, f, ensure_ascii=False, indent=2)
-    print(f"Wrote reference material to {DATA_DIR}/reference.json")
+    with build_phase(report, "reference") as phase:
+        reference_path = os.path.join(DATA_DIR, "reference.json")
+        key = digest_files([os.path.join(EXTRACTED, "reference_material.json")], manifest) + variants_key
+        phase["skipped"] = step_is_fresh(manifest, "reference", key, [reference_path])
+        if phase["skipped"]:
+            print(f"{DATA_DIR}/reference.json is up to date")
+        else:
+            written = write_if_changed(reference_path, dump_json(build_reference(variants)), manifest)
+            record_step(manifest, "reference", key, [reference_path])
+            print(f"{'Wrote' if written else 'Unchanged'}: reference material in {DATA_DIR}/reference.json")
+
+    # Full-text search index over questions and reference material
+    with build_phase(report, "search") as phase:
+        key = digest_files(exam_files() + [os.path.join(EXTRACTED, "reference_material.json"),
+                                           search_index.__file__], manifest)
+        prev_outputs = manifest["steps"].get("search", {}).get("outputs", {})
+        phase["skipped"] = step_is_fresh(manifest, "search", key, list(prev_outputs))
+        if phase["skipped"]:
+            print(f"{SEARCH_FILE} is up to date")
+        else:
+            index = search_index.build_index(iter_questions(jobs=args.jobs), build_reference())
+            outputs = write_precompressed(SEARCH_FILE, dump_json_min(index), manifest)
+            record_step(manifest, "search", key, outputs)
+            phase["terms"] = len(index["terms"])
+            print(f"Indexed {len(index['terms'])} terms over {index['questions']} questions and "
+                  f"{len(index['reference'])} reference entries in {SEARCH_FILE} "
+                  f"({os.path.getsize(SEARCH_FILE) / 1024:.0f} KB)")
+
+    # Content-hash cache tokens in index.html
+    with build_phase(report, "cache_version") as phase:
+        phase["skipped"] = not bump_cache_version(manifest)
+    if phase["skipped"]:
+        print("Cache versions in index.html are up to date")
+    else:
+        print("Updated cache versions in index.html")
+
+    # Service worker precache manifest (after index.html, which it hashes)
+    with build_phase(report, "precache") as phase:
+        precache, written = write_precache_manifest(manifest, variants)
+        phase["skipped"] = not written
+    print(f"{'Wrote' if written else 'Unchanged'}: {PRECACHE_FILE} "
+          f"({len(precache['core'])} core files, {len(precache['images'])} images, version {precache['version']})")
 
-    # Copy images
-    count = 0
+    with build_phase(report, "manifest"):
+        save_manifest(manifest)
+    write_build_report(report, args.report, report_stdout)
+    return report
+
+
+# --- Watch mode ---
+
+def watched_files():
+    """Every input the build reads: exams, reference material, store images and the app shell."""
+    paths = exam_files() + [os.path.join(EXTRACTED, "reference_material.json")]
+    paths += [os.path.join(DOCS, f) for f in SHELL_FILES]
     if os.path.isdir(SRC_IMG_DIR):
-        for fname in os.listdir(SRC_IMG_DIR):
-            if fname.endswith(".png"):
-                shutil.copy2(os.path.join(SRC_IMG_DIR, fname), os.path.join(IMG_DIR, fname))
-                count += 1
-    print(f"Copied {count} images to {IMG_DIR}/")
+        paths += [os.path.join(SRC_IMG_DIR, f) for f in sorted(os.listdir(SRC_IMG_DIR)) if f.endswith(".png")]
+    return paths
 
-    # Bump cache version in index.html
-    index_path = os.path.join(DOCS, "index.html")
-    with open(index_path, "r", encoding="utf-8") as f:
-        html = f.read()
-    version = str(int(time.time()))
-    html = re.sub(r'\?v=\w+', f'?v={version}', html)
-    with open(index_path, "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"Bumped cache version to {version} in index.html")
+
+def watch_snapshot():
+    snap = {}
+    for path in watched_files():
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        snap[path] = (st.st_size, st.st_mtime_ns)
+    return snap
+
+
+def wait_for_changes(before, interval):
+    """Poll until the watched files differ from `before` and have stopped changing.
+
+    Returns (changed paths, the settled snapshot).
+    """
+    while True:
+        time.sleep(interval)
+        now = watch_snapshot()
+        if now == before:
+            continue
+        # Editors and the annotator write in several steps: wait for a quiet poll
+        while True:
+            time.sleep(interval)
+            settled = watch_snapshot()
+            if settled == now:
+                break
+            now = settled
+        changed = sorted(p for p in before.keys() | now.keys() if before.get(p) != now.get(p))
+        return changed, now
+
+
+def watch(args, on_build=None):
+    """Build, then rebuild whenever a watched file changes, until interrupted.
+
+    The manifest makes each rebuild targeted: an exam edit rewrites the question
+    outputs whose content changed, reference_material.json rewrites reference.json
+    (and the search index that covers it), and a new crop links just that image.
+    on_build(changed paths, report) is called after every build.
+    """
+    changed = []
+    try:
+        while True:
+            try:
+                report = build(args)
+            except Exception as e:  # a half-saved JSON shouldn't end the session
+                print(f"Build failed: {e!r}")
+                report = None
+            if on_build:
+                on_build(changed, report)
+            args.force = False
+            # Snapshot after building, so the build's own writes (index.html) don't retrigger it
+            print(f"Watching {EXTRACTED}/ and the app shell for changes (Ctrl+C to stop)")
+            changed, _ = wait_for_changes(watch_snapshot(), args.interval)
+            print(f"\nChanged: {', '.join(changed)}")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.watch:
+        watch(args)
+    else:
+        build(args)
 
 
 if __name__ == "__main__":
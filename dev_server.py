@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Local dev server for docs/ with live reload.
+
+Usage:
+    python3 dev_server.py [--port 8000] [build_site_data.py options]
+
+Serves docs/ and runs build_site_data.py in --watch mode alongside it. After
+each rebuild that wrote an output, open pages reload: index.html is served
+with a small script that listens for reload events on /__livereload
+(Server-Sent Events). The service worker is disabled here so that a reload
+never comes from its cache.
+"""
+
+import argparse
+import http.server
+import os
+import sys
+import threading
+from urllib.parse import urlparse
+
+import build_site_data as bsd
+
+PORT = 8000
+RELOAD_PATH = "/__livereload"
+KEEPALIVE_SECONDS = 15
+RELOAD_SNIPPET = f"""<script>
+  // Injected by dev_server.py: drop any service worker and reload after rebuilds
+  if (navigator.serviceWorker) {{
+    navigator.serviceWorker.getRegistrations().then(regs => regs.forEach(r => r.unregister()));
+  }}
+  new EventSource("{RELOAD_PATH}").addEventListener("reload", () => location.reload());
+</script>
+""".encode("utf-8")
+
+# Bumped after every rebuild that changed an output; reload streams wait on it
+_reload = {"generation": 0}
+_reload_cond = threading.Condition()
+
+
+def notify_reload():
+    with _reload_cond:
+        _reload["generation"] += 1
+        _reload_cond.notify_all()
+
+
+class DevHandler(http.server.SimpleHTTPRequestHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=bsd.DOCS, **kwargs)
+
+    def end_headers(self):
+        # Never let the browser cache: the point is to see every rebuild
+        self.send_header("Cache-Control", "no-store")
+        super().end_headers()
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == RELOAD_PATH:
+            self._stream_reloads()
+        elif path == "/sw.js":
+            self.send_error(404, "Service worker disabled by dev_server.py")
+        elif path in ("/", "/index.html"):
+            self._serve_index()
+        else:
+            super().do_GET()
+
+    def _serve_index(self):
+        with open(os.path.join(bsd.DOCS, "index.html"), "rb") as f:
+            html = f.read()
+        i = html.rfind(b"</body>")
+        html = html[:i] + RELOAD_SNIPPET + html[i:] if i >= 0 else html + RELOAD_SNIPPET
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", len(html))
+        self.end_headers()
+        self.wfile.write(html)
+
+    def _stream_reloads(self):
+        """Server-Sent Events: a "reload" event per rebuild, comments as keep-alives."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        with _reload_cond:
+            seen = _reload["generation"]
+        while True:
+            with _reload_cond:
+                _reload_cond.wait_for(lambda: _reload["generation"] != seen, timeout=KEEPALIVE_SECONDS)
+                current = _reload["generation"]
+            message = b"event: reload\ndata: {}\n\n" if current != seen else b": keep-alive\n\n"
+            seen = current
+            try:
+                self.wfile.write(message)
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    def log_request(self, code="-", size="-"):
+        # Page loads fetch dozens of files; only failures are worth a line
+        if isinstance(code, int) and code >= 400:
+            super().log_request(code, size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve docs/ with live reload while rebuilding on changes.",
+                                     epilog="Other options are passed to build_site_data.py.")
+    parser.add_argument("--port", type=int, default=PORT)
+    args, rest = parser.parse_known_args(argv)
+    build_args = bsd.build_parser().parse_args(rest)
+
+    server = http.server.ThreadingHTTPServer(("localhost", args.port), DevHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving {bsd.DOCS}/ at http://localhost:{args.port}/ with live reload")
+
+    def on_build(changed, report):
+        if not changed or report is None:
+            return
+        if any(p["files_written"] for p in report["phases"] if p["name"] != "manifest"):
+            notify_reload()
+            print("Reloading open pages")
+        else:
+            print("No outputs changed; not reloading")
+
+    bsd.watch(build_args, on_build)
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
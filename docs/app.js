@@ -8,16 +8,121 @@ let sessionHistory = [];  // last 10 shown question IDs
 let sessionCount = 0;
 let referenceData = null;
 let dangerQueue = [];  // queued sibling sub-questions for current danger scenario
+let bundles = null;  // data/bundles.json: per-category shard files
+let questionIndex = null;  // data/index.json: positions, filter lists, danger groups
+const filterCache = {};  // filter -> question list, cleared when a shard arrives
+const shardLoads = {};  // category -> Promise for its shard
+const loadedShards = new Set();  // categories whose shard has arrived
+let indexReady = null;  // resolves once the question index (or questions.json) is loaded
 
-const STORAGE_KEY = "jdl_progress";
+const STORAGE_KEY = "jdl_progress";  // legacy {id: {correct, wrong, streak}} map, migrated on first load
+const PROGRESS_KEY = "jdl_progress_v2";
 
 // --- Data Loading ---
 
 async function fetchQuestions() {
-  const res = await fetch("data/questions.json");
-  allQuestions = await res.json();
-  applyFilter(currentFilter);
-  updateHomeProgress();
+  try {
+    const res = await fetch("data/bundles.json");
+    if (res.ok) bundles = await res.json();
+  } catch {
+    bundles = null;
+  }
+
+  if (!bundles || !bundles.index) {
+    // Older builds only have the single combined file
+    const res = await fetch("data/questions.json");
+    allQuestions = await res.json();
+    questionIndex = buildQuestionIndex(allQuestions);
+    applyFilter(currentFilter);
+    return;
+  }
+
+  const idx = bundles.index;
+  questionIndex = await fetch(`${idx.file}?v=${idx.hash}`).then(res => res.json());
+  allQuestions = new Array(questionIndex.total);
+
+  // The active filter's shard is requested first and the rest load in the background;
+  // each filter shows a loading state until its shards are in (see questionsReady)
+  const names = Object.keys(bundles.categories);
+  if (names.includes(currentFilter)) loadCategory(currentFilter);
+  names.forEach(loadCategory);
+}
+
+async function questionsReady(filter = "all") {
+  // Resolves once every question `filter` covers is loaded: a category needs its own shard, "all" every one
+  await indexReady;
+  if (!bundles || !bundles.index) return;
+  const names = filter in bundles.categories ? [filter] : Object.keys(bundles.categories);
+  await Promise.all(names.map(loadCategory));
+}
+
+function loadCategory(name) {
+  if (!shardLoads[name]) {
+    const shard = bundles.categories[name];
+    shardLoads[name] = fetch(`${shard.file}?v=${shard.hash}`)
+      .then(res => res.json())
+      .then(qs => {
+        // Place each question at its questions.json position
+        for (const q of qs) allQuestions[questionIndex.positions[q.id]] = q;
+        loadedShards.add(name);
+        for (const key in filterCache) delete filterCache[key];
+        applyFilter(currentFilter);
+      });
+  }
+  return shardLoads[name];
+}
+
+// Same structure as new_question_index()/add_to_index() in build_site_data.py
+function buildQuestionIndex(questions) {
+  const index = {
+    total: questions.length,
+    positions: {},
+    filters: { lp: [], dl: [], danger: [] },
+    danger_groups: {},
+    images: [],
+    slots: [],
+    slot_count: 0,
+  };
+  questions.forEach((q, i) => {
+    if (q.slot === undefined) q.slot = i;
+    index.positions[q.id] = i;
+    index.slots.push(q.slot);
+    index.slot_count = Math.max(index.slot_count, q.slot + 1);
+    if (q.source.startsWith("lp")) index.filters.lp.push(i);
+    if (q.type === "standard" && q.source.startsWith("dl")) index.filters.dl.push(i);
+    if (q.type === "danger") index.filters.danger.push(i);
+    if (q.has_image && q.image_file) index.images.push(i);
+  });
+  const byId = [...index.filters.danger].sort((a, b) => questions[a].id.localeCompare(questions[b].id));
+  for (const i of byId) {
+    const group = dangerGroup(questions[i].id);
+    (index.danger_groups[group] = index.danger_groups[group] || []).push(i);
+  }
+  return index;
+}
+
+function dangerGroup(id) {
+  // "dl1_q91_3" -> "dl1_q91"
+  return id.replace(/_\d+$/, "");
+}
+
+function filterLoaded(filter) {
+  // A category filter needs its own shard; "all" needs every one
+  if (!questionIndex) return false;
+  if (!bundles || !bundles.index) return true;  // single-file build, loaded at once
+  const names = filter in bundles.categories ? [filter] : Object.keys(bundles.categories);
+  return names.every(name => loadedShards.has(name));
+}
+
+function questionsFor(filter) {
+  // Loaded questions for a filter, in questions.json order (holes skipped while shards load)
+  if (!filterCache[filter]) {
+    const positions = questionIndex.filters[filter];
+    filterCache[filter] = positions
+      ? positions.map(i => allQuestions[i]).filter(Boolean)
+      : allQuestions.filter(Boolean);
+  }
+  return filterCache[filter];
 }
 
 async function fetchReference() {
@@ -29,23 +134,95 @@ async function fetchReference() {
 
 // --- Progress (localStorage) ---
 
+// Progress is one Uint16Array of [correct, wrong, streak] per question slot (the
+// stable integer the build assigns each id, see SLOTS_FILE in build_site_data.py).
+// It is decoded from localStorage once and updated in place; the stored form is
+// the array's bytes in base64 (little-endian, as on every browser).
+const PROGRESS_FIELDS = 3;
+const CORRECT = 0, WRONG = 1, STREAK = 2;
+let progressData = null;
+
 function getProgress() {
+  if (progressData) return progressData;
+  const stored = localStorage.getItem(PROGRESS_KEY);
+  let saved = null;
   try {
-    return JSON.parse(localStorage.getItem(STORAGE_KEY)) || {};
+    saved = stored ? decodeProgress(stored) : null;
   } catch {
-    return {};
+    saved = null;
+  }
+  // Sized by the registry, which only grows; keep anything stored beyond it
+  const length = Math.max(questionIndex.slot_count * PROGRESS_FIELDS, saved ? saved.length : 0);
+  progressData = new Uint16Array(length);
+  if (saved) {
+    progressData.set(saved);
+  } else {
+    migrateProgress(progressData);
+  }
+  return progressData;
+}
+
+function migrateProgress(data) {
+  // One-time import of the old {id: {correct, wrong, streak}} map
+  let legacy = null;
+  try {
+    legacy = JSON.parse(localStorage.getItem(STORAGE_KEY));
+  } catch {
+    legacy = null;
+  }
+  if (!legacy) return;
+  for (const [id, p] of Object.entries(legacy)) {
+    const position = questionIndex.positions[id];
+    if (position === undefined) continue;  // question no longer exists
+    const i = questionIndex.slots[position] * PROGRESS_FIELDS;
+    data[i + CORRECT] = Math.min(p.correct || 0, 0xffff);
+    data[i + WRONG] = Math.min(p.wrong || 0, 0xffff);
+    data[i + STREAK] = Math.min(p.streak || 0, 0xffff);
+  }
+  saveProgress();
+  localStorage.removeItem(STORAGE_KEY);
+}
+
+function encodeProgress(data) {
+  const bytes = new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+  let binary = "";
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
   }
+  return btoa(binary);
+}
+
+function decodeProgress(text) {
+  const binary = atob(text);
+  const bytes = new Uint8Array(binary.length - (binary.length % 2));
+  for (let i = 0; i < bytes.length; i++) bytes[i] = binary.charCodeAt(i);
+  return new Uint16Array(bytes.buffer);
 }
 
-function saveProgress(progress) {
-  localStorage.setItem(STORAGE_KEY, JSON.stringify(progress));
+function saveProgress() {
+  localStorage.setItem(PROGRESS_KEY, encodeProgress(getProgress()));
 }
 
-function getQuestionStatus(id) {
-  const p = getProgress()[id];
-  if (!p) return "unseen";
-  if (p.streak >= 1) return "mastered";
-  if (p.streak === 0 && p.wrong > 0) return "wrong";
+function recordAnswer(q, correct) {
+  // Counters saturate instead of wrapping around
+  const data = getProgress();
+  const i = q.slot * PROGRESS_FIELDS;
+  if (correct) {
+    data[i + CORRECT] = Math.min(data[i + CORRECT] + 1, 0xffff);
+    data[i + STREAK] = Math.min(data[i + STREAK] + 1, 0xffff);
+  } else {
+    data[i + WRONG] = Math.min(data[i + WRONG] + 1, 0xffff);
+    data[i + STREAK] = 0;
+  }
+  return data[i + STREAK];
+}
+
+function getQuestionStatus(q) {
+  const data = getProgress();
+  const i = q.slot * PROGRESS_FIELDS;
+  if (!data[i + CORRECT] && !data[i + WRONG]) return "unseen";
+  if (data[i + STREAK] >= 1) return "mastered";
+  if (data[i + WRONG] > 0) return "wrong";
   return "in_progress";
 }
 
@@ -53,15 +230,7 @@ function getQuestionStatus(id) {
 
 function applyFilter(filter) {
   currentFilter = filter;
-  if (filter === "all") {
-    filteredQuestions = allQuestions;
-  } else if (filter === "lp") {
-    filteredQuestions = allQuestions.filter(q => q.source.startsWith("lp"));
-  } else if (filter === "dl") {
-    filteredQuestions = allQuestions.filter(q => q.type === "standard" && q.source.startsWith("dl"));
-  } else if (filter === "danger") {
-    filteredQuestions = allQuestions.filter(q => q.type === "danger");
-  }
+  filteredQuestions = filterLoaded(filter) ? questionsFor(filter) : [];
 
   // Update active button
   document.querySelectorAll(".filter-btn").forEach(btn => {
@@ -77,7 +246,7 @@ function pickQuestion() {
   const buckets = { wrong: [], unseen: [], in_progress: [], mastered: [] };
 
   for (const q of filteredQuestions) {
-    const status = getQuestionStatus(q.id);
+    const status = getQuestionStatus(q);
     buckets[status].push(q);
   }
 
@@ -147,10 +316,14 @@ function randomFrom(arr) {
 // --- Home Progress ---
 
 function updateHomeProgress() {
-  const progress = getProgress();
+  if (!filterLoaded(currentFilter)) {
+    document.getElementById("progress-bar").style.width = "0%";
+    document.getElementById("progress-text").textContent = "Loading questions…";
+    return;
+  }
   let mastered = 0;
   for (const q of filteredQuestions) {
-    if (getQuestionStatus(q.id) === "mastered") mastered++;
+    if (getQuestionStatus(q) === "mastered") mastered++;
   }
   const total = filteredQuestions.length;
   const pct = total > 0 ? Math.round((mastered / total) * 100) : 0;
@@ -159,6 +332,47 @@ function updateHomeProgress() {
     `${mastered} / ${total} mastered (${pct}%)`;
 }
 
+// --- Images ---
+
+// Images are at most the content column wide (600px body minus padding)
+const IMAGE_SIZES = "(max-width: 600px) calc(100vw - 32px), 568px";
+
+function setImageSources(img, file, variants) {
+  // Let the browser pick the smallest adequate variant: AVIF (built with --avif) through a
+  // <source> in the enclosing <picture>, else WebP; the PNG stays as fallback.
+  // Returns the element to insert, which is a new <picture> when img needed one.
+  const srcset = type => (variants ? variants.variants : [])
+    .filter(v => v.type === type).map(v => `${v.file} ${v.width}w`).join(", ");
+  setSrcset(img, srcset("image/webp"));
+  img.src = file;
+
+  const avif = srcset("image/avif");
+  let picture = img.parentElement && img.parentElement.tagName === "PICTURE" ? img.parentElement : null;
+  if (!picture && !avif) return img;
+  if (!picture) {
+    picture = document.createElement("picture");
+    if (img.parentNode) img.replaceWith(picture);
+    picture.appendChild(img);
+  }
+  let source = picture.querySelector("source");
+  if (!source) {
+    source = document.createElement("source");
+    source.type = "image/avif";
+    picture.prepend(source);
+  }
+  setSrcset(source, avif);
+  return picture;
+}
+
+function setSrcset(el, srcset) {
+  if (srcset) {
+    el.srcset = srcset;
+    el.sizes = IMAGE_SIZES;
+  } else {
+    el.removeAttribute("srcset");
+  }
+}
+
 // --- Study Flow ---
 
 function showQuestion(q) {
@@ -174,11 +388,11 @@ function showQuestion(q) {
   // Image
   const imgEl = document.getElementById("question-image");
   if (q.has_image && q.image_file) {
-    imgEl.src = q.image_file;
+    setImageSources(imgEl, q.image_file, q.image_variants);
     imgEl.style.display = "block";
   } else {
     imgEl.style.display = "none";
-    imgEl.src = "";
+    setImageSources(imgEl, "", null);
   }
 
   // Scenario (danger questions)
@@ -197,7 +411,7 @@ function showQuestion(q) {
   let counterText = `#${sessionCount}`;
   if (q.type === "danger") {
     const subNum = q.id.match(/_(\d+)$/)[1];
-    const totalSibs = allQuestions.filter(o => o.id.startsWith(q.id.replace(/_\d+$/, "_"))).length;
+    const totalSibs = questionIndex.danger_groups[dangerGroup(q.id)].length;
     counterText += `  (${subNum}/${totalSibs})`;
   }
   document.getElementById("study-counter").textContent = counterText;
@@ -217,29 +431,12 @@ function submitAnswer(answer) {
   const correct = answer === currentQuestion.correct_answer;
 
   // Update progress
-  const progress = getProgress();
-  const p = progress[currentQuestion.id] || { correct: 0, wrong: 0, streak: 0 };
-  if (correct) {
-    p.correct++;
-    p.streak++;
-  } else {
-    p.wrong++;
-    p.streak = 0;
-    // If a danger sub-question is wrong, mark all siblings as wrong too
-    if (currentQuestion.type === "danger") {
-      const prefix = currentQuestion.id.replace(/_\d+$/, "_");
-      for (const q of allQuestions) {
-        if (q.id.startsWith(prefix) && q.id !== currentQuestion.id) {
-          const sp = progress[q.id] || { correct: 0, wrong: 0, streak: 0 };
-          sp.wrong++;
-          sp.streak = 0;
-          progress[q.id] = sp;
-        }
-      }
-    }
+  const streak = recordAnswer(currentQuestion, correct);
+  // If a danger sub-question is wrong, mark all siblings as wrong too
+  if (!correct && currentQuestion.type === "danger") {
+    for (const q of getDangerSiblings(currentQuestion)) recordAnswer(q, false);
   }
-  progress[currentQuestion.id] = p;
-  saveProgress(progress);
+  saveProgress();
 
   // Show result
   document.getElementById("answer-buttons").style.display = "none";
@@ -247,7 +444,7 @@ function submitAnswer(answer) {
   resultPanel.style.display = "block";
 
   const banner = document.getElementById("result-banner");
-  const justMastered = correct && p.streak === 1;
+  const justMastered = correct && streak === 1;
   banner.className = "result-banner " + (correct ? "correct" : "incorrect");
   let bannerText = correct ? "Correct!" : "Incorrect - Answer: " + (currentQuestion.correct_answer === "T" ? "TRUE" : "FALSE");
   if (justMastered) bannerText += " Mastered!";
@@ -257,10 +454,10 @@ function submitAnswer(answer) {
 }
 
 function getDangerSiblings(q) {
-  // Given a danger sub-question like "dl1_q91_1", find all siblings "dl1_q91_*"
-  const prefix = q.id.replace(/_\d+$/, "_");
-  return allQuestions.filter(other => other.id.startsWith(prefix) && other.id !== q.id)
-    .sort((a, b) => a.id.localeCompare(b.id));
+  // Given a danger sub-question like "dl1_q91_1", its siblings "dl1_q91_*" in id order
+  return questionIndex.danger_groups[dangerGroup(q.id)]
+    .map(i => allQuestions[i])
+    .filter(other => other && other.id !== q.id);
 }
 
 function nextQuestion() {
@@ -292,6 +489,9 @@ function showView(viewId) {
     if (!currentQuestion) nextQuestion();
   } else if (viewId === "reference") {
     renderReference();
+  } else if (viewId === "search") {
+    loadSearchIndex();
+    document.getElementById("search-input").focus();
   } else if (viewId === "stats") {
     renderStats();
   }
@@ -321,10 +521,9 @@ async function renderReference() {
     // Section-level image
     if (section.image_file) {
       const img = document.createElement("img");
-      img.src = section.image_file;
       img.alt = section.title;
       img.className = "section-image";
-      body.appendChild(img);
+      body.appendChild(setImageSources(img, section.image_file, section.image_variants));
     }
 
     if (section.points) {
@@ -337,9 +536,8 @@ async function renderReference() {
           li.textContent = point.text;
           if (point.image_file) {
             const img = document.createElement("img");
-            img.src = point.image_file;
             img.alt = point.text;
-            li.appendChild(img);
+            li.appendChild(setImageSources(img, point.image_file, point.image_variants));
           }
         }
         ul.appendChild(li);
@@ -360,24 +558,160 @@ async function renderReference() {
   }
 }
 
+// --- Search ---
+// Queries data/search.json, built by search_index.py; tokenize()/stem() must match it
+
+const SEARCH_STOPWORDS = new Set(`a an and are as at be by for from has have if in into is it its of on or that the
+their then there these this to was were when which while will with you your`.split(/\s+/));
+const MAX_PREFIX_TERMS = 20;
+let searchData = null;  // Promise for data/search.json
+
+function stem(word) {
+  if (word.length <= 3 || /^\d+$/.test(word)) return word;
+  if (word.endsWith("ies") && word.length > 4) word = word.slice(0, -3) + "y";
+  else if (word.endsWith("sses")) word = word.slice(0, -2);
+  else if ((word.endsWith("es") && "sxz".includes(word[word.length - 3])) || word.endsWith("ches") || word.endsWith("shes")) word = word.slice(0, -2);
+  else if (word.endsWith("s") && !/(ss|us|is)$/.test(word)) word = word.slice(0, -1);
+  for (const suffix of ["ing", "ed"]) {
+    if (word.endsWith(suffix) && word.length - suffix.length >= 3) {
+      word = word.slice(0, -suffix.length);
+      const last = word[word.length - 1];
+      if (last === word[word.length - 2] && !"lsz".includes(last)) word = word.slice(0, -1);
+      break;
+    }
+  }
+  if (word.endsWith("e") && word.length > 4) word = word.slice(0, -1);
+  return word;
+}
+
+function tokenize(text) {
+  return (text.toLowerCase().match(/[a-z0-9]+/g) || [])
+    .filter(t => !SEARCH_STOPWORDS.has(t) && (t.length > 1 || /\d/.test(t)))
+    .map(stem);
+}
+
+function loadSearchIndex() {
+  if (!searchData) {
+    searchData = fetch("data/search.json").then(res => res.json()).then(index => {
+      index.sortedTerms = Object.keys(index.terms).sort();
+      return index;
+    });
+  }
+  return searchData;
+}
+
+function expandTerms(index, term, last) {
+  if (term in index.terms) return [term];
+  if (!last) return [];
+  // The word being typed may be the prefix of longer terms
+  const words = index.sortedTerms;
+  let lo = 0, hi = words.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (words[mid] < term) lo = mid + 1; else hi = mid;
+  }
+  const found = [];
+  for (let i = lo; i < words.length && words[i].startsWith(term) && found.length < MAX_PREFIX_TERMS; i++) {
+    found.push(words[i]);
+  }
+  return found;
+}
+
+// Ranked hits: most query words matched first, then summed BM25 score
+function searchIndex(index, query, limit = 20) {
+  const words = [...new Set(tokenize(query))];
+  const scores = new Map(), matched = new Map();
+  words.forEach((word, k) => {
+    const seen = new Set();
+    for (const term of expandTerms(index, word, k === words.length - 1)) {
+      const flat = index.terms[term];
+      let doc = 0;
+      for (let j = 0; j < flat.length; j += 2) {
+        doc += flat[j];
+        scores.set(doc, (scores.get(doc) || 0) + flat[j + 1]);
+        if (!seen.has(doc)) {
+          seen.add(doc);
+          matched.set(doc, (matched.get(doc) || 0) + 1);
+        }
+      }
+    }
+  });
+  return [...scores.keys()]
+    .sort((a, b) => matched.get(b) - matched.get(a) || scores.get(b) - scores.get(a) || a - b)
+    .slice(0, limit)
+    .map(doc => doc < index.questions
+      ? { kind: "question", position: doc }
+      : { kind: "reference", section: index.reference[doc - index.questions][0],
+          point: index.reference[doc - index.questions][1] });
+}
+
+async function renderSearch(query) {
+  const container = document.getElementById("search-results");
+  if (!query.trim()) {
+    container.innerHTML = "";
+    return;
+  }
+  const [index, ref] = await Promise.all([loadSearchIndex(), fetchReference(), questionsReady()]);
+  const hits = searchIndex(index, query);
+  container.innerHTML = "";
+  if (hits.length === 0) {
+    container.textContent = "No matches";
+    return;
+  }
+  for (const hit of hits) {
+    const item = document.createElement("div");
+    item.className = "search-result";
+    const label = document.createElement("div");
+    label.className = "question-source";
+    const text = document.createElement("div");
+    if (hit.kind === "question") {
+      const q = allQuestions[hit.position];
+      label.textContent = q.id.toUpperCase();
+      text.textContent = q.text;
+      item.addEventListener("click", () => {
+        currentQuestion = q;
+        dangerQueue = [];
+        showView("study");
+        showQuestion(q);
+      });
+    } else {
+      const section = ref.key_points_to_remember.sections[hit.section];
+      const point = hit.point >= 0 ? section.points[hit.point] : section.title;
+      label.textContent = `Reference - ${section.title}`;
+      text.textContent = typeof point === "string" ? point : point.text;
+      item.addEventListener("click", () => showReferenceSection(hit.section));
+    }
+    item.append(label, text);
+    container.appendChild(item);
+  }
+}
+
+async function showReferenceSection(index) {
+  showView("reference");
+  await renderReference();
+  const section = document.querySelectorAll("#reference-content .accordion-section")[index];
+  section.classList.add("open");
+  section.scrollIntoView();
+}
+
 // --- Stats View ---
 
-function renderStats() {
+async function renderStats() {
   const container = document.getElementById("stats-content");
+  await questionsReady();
   container.innerHTML = "";
 
-  const progress = getProgress();
   const categories = [
-    { label: "All Questions", filter: () => true },
-    { label: "Learner's Permit", filter: q => q.source.startsWith("lp") },
-    { label: "Driver's License (Standard)", filter: q => q.type === "standard" && q.source.startsWith("dl") },
-    { label: "Danger Anticipation", filter: q => q.type === "danger" },
+    { label: "All Questions", filter: "all" },
+    { label: "Learner's Permit", filter: "lp" },
+    { label: "Driver's License (Standard)", filter: "dl" },
+    { label: "Danger Anticipation", filter: "danger" },
   ];
 
   // Overall stats
   const overallBuckets = { mastered: 0, in_progress: 0, wrong: 0, unseen: 0 };
-  for (const q of allQuestions) {
-    overallBuckets[getQuestionStatus(q.id)]++;
+  for (const q of questionsFor("all")) {
+    overallBuckets[getQuestionStatus(q)]++;
   }
 
   const grid = document.createElement("div");
@@ -399,10 +733,10 @@ function renderStats() {
 
   // Per-category breakdown
   for (const cat of categories) {
-    const qs = allQuestions.filter(cat.filter);
+    const qs = questionsFor(cat.filter);
     const buckets = { mastered: 0, in_progress: 0, wrong: 0, unseen: 0 };
     for (const q of qs) {
-      buckets[getQuestionStatus(q.id)]++;
+      buckets[getQuestionStatus(q)]++;
     }
 
     const div = document.createElement("div");
@@ -422,7 +756,9 @@ function renderStats() {
 
 function resetProgress() {
   if (confirm("Reset all progress? This cannot be undone.")) {
+    localStorage.removeItem(PROGRESS_KEY);
     localStorage.removeItem(STORAGE_KEY);
+    progressData = null;
     sessionHistory = [];
     sessionCount = 0;
     currentQuestion = null;
@@ -435,7 +771,7 @@ function resetProgress() {
 // --- Init ---
 
 document.addEventListener("DOMContentLoaded", () => {
-  fetchQuestions();
+  indexReady = fetchQuestions();
 
   // Filter buttons
   document.querySelectorAll(".filter-btn").forEach(btn => {
@@ -443,9 +779,18 @@ document.addEventListener("DOMContentLoaded", () => {
   });
 
   // Start button
-  document.getElementById("start-btn").addEventListener("click", () => {
+  document.getElementById("start-btn").addEventListener("click", async () => {
+    await questionsReady(currentFilter);
     currentQuestion = null;
     sessionCount = 0;
     showView("study");
   });
+
+  // Search as you type
+  document.getElementById("search-input").addEventListener("input", e => renderSearch(e.target.value));
+
+  // Offline cache (see sw.js); needs http(s), so opening the file directly skips it
+  if ("serviceWorker" in navigator && location.protocol.startsWith("http")) {
+    navigator.serviceWorker.register("sw.js").catch(() => {});
+  }
 });
@@ -0,0 +1,124 @@
+// Offline cache for the study app.
+// PRECACHE_VERSION is rewritten by build_site_data.py whenever precache-manifest.json
+// changes, which is what makes the browser install an updated worker.
+const PRECACHE_VERSION = "ced174075b";
+const PRECACHE_PREFIX = "precache-";
+const IMAGE_CACHE = "images";
+const MANIFEST_URL = "precache-manifest.json";
+
+const scopeUrl = path => new URL(path, self.registration.scope).href;
+
+// Manifest the current cache contents were built from, kept in the cache itself
+async function cachedManifest(cache) {
+  const res = cache && await cache.match(scopeUrl(MANIFEST_URL));
+  return res ? res.json() : null;
+}
+
+async function currentCache() {
+  const names = (await caches.keys()).filter(n => n.startsWith(PRECACHE_PREFIX));
+  const name = names.find(n => n !== PRECACHE_PREFIX + PRECACHE_VERSION);
+  return name ? caches.open(name) : null;
+}
+
+// --- Install: the app shell and data, reusing unchanged entries from the old cache ---
+
+self.addEventListener("install", event => {
+  event.waitUntil((async () => {
+    const res = await fetch(`${MANIFEST_URL}?v=${PRECACHE_VERSION}`, { cache: "no-store" });
+    const manifest = await res.clone().json();
+    const oldCache = await currentCache();
+    const oldManifest = await cachedManifest(oldCache);
+    const cache = await caches.open(PRECACHE_PREFIX + PRECACHE_VERSION);
+
+    await Promise.all(Object.entries(manifest.core).map(async ([url, hash]) => {
+      const key = scopeUrl(url);
+      if (oldManifest && oldManifest.core[url] === hash) {
+        const hit = await oldCache.match(key);
+        if (hit) return cache.put(key, hit);
+      }
+      const fresh = await fetch(`${url}?v=${hash}`, { cache: "reload" });
+      if (!fresh.ok) throw new Error(`precache ${url}: ${fresh.status}`);
+      return cache.put(key, fresh);
+    }));
+    // Stored last: a cache without its manifest is never treated as complete
+    await cache.put(scopeUrl(MANIFEST_URL), res);
+  })());
+});
+
+// --- Activate: drop old caches and images whose content changed ---
+
+self.addEventListener("activate", event => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(PRECACHE_PREFIX + PRECACHE_VERSION);
+    const manifest = await cachedManifest(cache);
+    const oldManifest = await cachedManifest(await currentCache());
+    for (const name of await caches.keys()) {
+      if (name.startsWith(PRECACHE_PREFIX) && name !== PRECACHE_PREFIX + PRECACHE_VERSION) {
+        await caches.delete(name);
+      }
+    }
+
+    const images = await caches.open(IMAGE_CACHE);
+    for (const req of await images.keys()) {
+      const url = req.url.slice(self.registration.scope.length);
+      const oldHash = oldManifest && oldManifest.images[url];
+      if (!(url in manifest.images) || (oldHash && oldHash !== manifest.images[url])) {
+        await images.delete(req);
+      }
+    }
+    await self.clients.claim();
+    warmImages(manifest);
+  })());
+});
+
+// Fetch the offline copy of each image in the background, one at a time
+async function warmImages(manifest) {
+  const images = await caches.open(IMAGE_CACHE);
+  for (const url of manifest.warm) {
+    if (await images.match(scopeUrl(url))) continue;
+    try {
+      const res = await fetch(`${url}?v=${manifest.images[url]}`);
+      if (res.ok) await images.put(scopeUrl(url), res);
+    } catch {
+      return;  // offline again; the next activation or image view fills the rest
+    }
+  }
+}
+
+// --- Fetch: cache first for everything the manifest knows about ---
+
+let activeManifest = null;  // promise, parsed once per worker start
+
+self.addEventListener("fetch", event => {
+  const req = event.request;
+  if (req.method !== "GET" || !req.url.startsWith(self.registration.scope)) return;
+  let url = new URL(req.url).pathname.slice(new URL(self.registration.scope).pathname.length);
+  if (url === "") url = "index.html";
+
+  event.respondWith((async () => {
+    const cache = await caches.open(PRECACHE_PREFIX + PRECACHE_VERSION);
+    if (!activeManifest) activeManifest = cachedManifest(cache);
+    const manifest = await activeManifest;
+    if (!manifest) activeManifest = null;
+    if (manifest && url in manifest.core) {
+      const hit = await cache.match(scopeUrl(url));
+      if (hit) return hit;
+    }
+    if (manifest && url in manifest.images) {
+      const images = await caches.open(IMAGE_CACHE);
+      const hit = await images.match(scopeUrl(url));
+      if (hit) return hit;
+      try {
+        const res = await fetch(req);
+        if (res.ok) await images.put(scopeUrl(url), res.clone());
+        return res;
+      } catch (err) {
+        // Offline: serve the variant that was cached for this image instead
+        const fallback = manifest.offline[url] && await images.match(scopeUrl(manifest.offline[url]));
+        if (fallback) return fallback;
+        throw err;
+      }
+    }
+    return fetch(req);
+  })());
+});
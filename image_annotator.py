@@ -9,12 +9,25 @@ Then open http://localhost:8765 in your browser.
 Draw rectangles around question images and tag them with question numbers.
 """
 
+import argparse
+import bisect
+import email.utils
+import gzip
+import hashlib
 import http.server
 import json
+import multiprocessing
 import os
 import re
+import struct
 import sys
-from urllib.parse import urlparse
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qs, urlparse
+
+import image_store
 
 PORT = 8765
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,6 +35,35 @@ EXTRACTED_DIR = os.path.join(BASE_DIR, "extracted")
 IMAGES_DIR = os.path.join(EXTRACTED_DIR, "images")
 Q_IMAGES_DIR = os.path.join(EXTRACTED_DIR, "question_images")
 ANNOTATIONS_FILE = os.path.join(EXTRACTED_DIR, "image_annotations.json")
+# Append-only log of per-(page, tag) edits on top of ANNOTATIONS_FILE
+JOURNAL_FILE = os.path.join(EXTRACTED_DIR, "image_annotations.journal")
+JOURNAL_COMPACT_OPS = 200
+# Crops are content-addressed <hash>.png files (see image_store.py). CROPS_FILE maps
+# each tag to its crop key and asset from the last process run, so unchanged crops are not redone
+CROPS_FILE = os.path.join(Q_IMAGES_DIR, ".crops.json")
+
+# Downscaled page scans and tiles, cached by source hash and size
+PAGE_CACHE_DIR = os.path.join(EXTRACTED_DIR, ".page_cache")
+SCALE_STEP = 256  # requested widths are rounded up to a multiple of this
+TILE_SIZE = 512
+SCALED_QUALITY = 85
+
+# Page scans are requested with ?v=<version>, so a versioned URL never changes content
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# Serializes writes to the annotation and exam files across handler threads
+WRITE_LOCK = threading.Lock()
+
+# Crop pools start from handler/job threads, where forking could copy a lock another
+# thread holds (e.g. the import lock during /api/suggest's lazy numpy import)
+POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Parsed exam JSONs keyed by filename -> (size, mtime_ns, data)
+_exam_cache = {}
+# Last /api/pages payload and the file stats it was built from
+_pages_cache = {"key": None, "entry": None}
+_cache_lock = threading.Lock()
 
 # Reference material images expected on pages 2-3
 # Each: (tag, description)
@@ -74,7 +116,75 @@ PAGES = [
 ]
 
 
+def file_version(path):
+    """Cheap validator for a file: size and mtime, as used in ETags and ?v= tokens."""
+    st = os.stat(path)
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+def _dir_stats(path, pred):
+    """(name, size, mtime_ns) for matching entries: a cheap change fingerprint for a directory."""
+    if not os.path.isdir(path):
+        return ()
+    return tuple(sorted(
+        (e.name, e.stat().st_size, e.stat().st_mtime_ns)
+        for e in os.scandir(path) if pred(e.name)
+    ))
+
+
+def _is_exam_file(name):
+    return name.endswith('.json') and 'exam' in name
+
+
+def load_exam_data():
+    """Parsed exam JSONs by filename; files are only re-read when their size/mtime change."""
+    exam_data = {}
+    for name, size, mtime_ns in _dir_stats(EXTRACTED_DIR, _is_exam_file):
+        cached = _exam_cache.get(name)
+        if not cached or cached[:2] != (size, mtime_ns):
+            with open(os.path.join(EXTRACTED_DIR, name)) as fh:
+                cached = _exam_cache[name] = (size, mtime_ns, json.load(fh))
+        exam_data[name] = cached[2]
+    for name in set(_exam_cache) - set(exam_data):
+        del _exam_cache[name]
+    return exam_data
+
+
+def get_pages_payload():
+    """Memoized /api/pages response: the page list plus its serialized, gzipped body and ETag.
+
+    Rebuilt only when a page scan or exam JSON is added, removed or modified.
+    """
+    key = (_dir_stats(IMAGES_DIR, lambda n: n.endswith('.png')),
+           _dir_stats(EXTRACTED_DIR, _is_exam_file))
+    with _cache_lock:
+        if _pages_cache["key"] != key:
+            data = _build_pages_data()
+            body = json.dumps(data).encode()
+            _pages_cache["entry"] = {
+                "data": data,
+                "body": body,
+                "gzip": gzip.compress(body, mtime=0),
+                "etag": f'"{hashlib.sha256(body).hexdigest()[:16]}"',
+            }
+            _pages_cache["key"] = key
+        return _pages_cache["entry"]
+
+
+def png_size(path):
+    """(width, height) from a PNG's IHDR chunk, without decoding the image."""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if header[:8] != b'\x89PNG\r\n\x1a\n':
+        return None, None
+    return struct.unpack('>II', header[16:24])
+
+
 def get_pages_data():
+    return get_pages_payload()["data"]
+
+
+def _build_pages_data():
     page_files = sorted(f for f in os.listdir(IMAGES_DIR) if f.endswith('.png'))
 
     page_exam_map = {}
@@ -84,17 +194,15 @@ def get_pages_data():
             "exam_type": et, "exam_num": en, "q_start": qs, "q_end": qe
         })
 
-    exam_data = {}
-    for f in os.listdir(EXTRACTED_DIR):
-        if f.endswith('.json') and 'exam' in f:
-            with open(os.path.join(EXTRACTED_DIR, f)) as fh:
-                exam_data[f] = json.load(fh)
+    exam_data = load_exam_data()
 
     pages = []
     for pf in page_files:
         parts = pf.split('_')
         page_prefix = parts[0] + '_' + parts[1]
-        page_info = {"filename": pf, "image_questions": [], "label": pf.replace('.png', '')}
+        page_info = {"filename": pf, "image_questions": [], "label": pf.replace('.png', ''),
+                     "version": file_version(os.path.join(IMAGES_DIR, pf))}
+        page_info["width"], page_info["height"] = png_size(os.path.join(IMAGES_DIR, pf))
 
         if page_prefix in page_exam_map:
             for entry in page_exam_map[page_prefix]:
@@ -149,16 +257,140 @@ def get_pages_data():
     return pages
 
 
+def write_json_atomic(path, data, **kwargs):
+    """Write JSON via a temp file + rename so readers never see a half-written file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, **kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _base_hash():
+    if not os.path.exists(ANNOTATIONS_FILE):
+        return None
+    with open(ANNOTATIONS_FILE, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# Hash of the base annotations file and the number of ops journaled on top of it, kept
+# in memory so a PATCH costs only its own ops. Recomputed when the files are first
+# used (or changed behind the server's back) and on compaction; guarded by WRITE_LOCK.
+_journal = {"key": None, "base": None, "pending": 0}
+
+
+def _journal_key():
+    st = os.stat(ANNOTATIONS_FILE) if os.path.exists(ANNOTATIONS_FILE) else None
+    return ANNOTATIONS_FILE, JOURNAL_FILE, st and (st.st_size, st.st_mtime_ns)
+
+
+def _read_journal(base):
+    """Ops recorded against the base annotations file with hash `base`, and whether the journal is clean.
+
+    The first line names the hash of the base file the ops apply to; a journal
+    left over from an older base is ignored. Each later line is one PATCH batch,
+    so a torn final line drops that whole batch and nothing else.
+    """
+    if not os.path.exists(JOURNAL_FILE):
+        return [], True
+    with open(JOURNAL_FILE) as f:
+        lines = f.read().splitlines()
+    try:
+        header = json.loads(lines[0])
+    except (IndexError, ValueError):
+        return [], False
+    if header.get("base") != base:
+        return [], False
+    ops = []
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+            ops += entry["ops"] if "ops" in entry else [entry]  # single-op lines from older journals
+        except (ValueError, TypeError):
+            return ops, False
+    return ops, True
+
+
+def _journal_state():
+    key = _journal_key()
+    if _journal["key"] != key:
+        base = _base_hash()
+        ops, clean = _read_journal(base)
+        if not clean:
+            # Rewrite a stale or torn journal so new batches append after the last good one
+            with open(JOURNAL_FILE, 'w') as f:
+                f.write(json.dumps({"base": base}) + "\n")
+                if ops:
+                    f.write(json.dumps({"ops": ops}) + "\n")
+        _journal.update(key=key, base=base, pending=len(ops))
+    return _journal
+
+
+def apply_annotation_op(annotations, op):
+    """Set (op["ann"] is a dict) or delete (None) the annotation for op["tag"] on op["page"]."""
+    page, tag, ann = op["page"], op["tag"], op.get("ann")
+    anns = [a for a in annotations.get(page, []) if a["tag"] != tag]
+    if ann is not None:
+        anns.append(dict(ann, tag=tag))
+    if anns:
+        annotations[page] = anns
+    else:
+        annotations.pop(page, None)
+
+
 def load_annotations():
+    annotations = {}
     if os.path.exists(ANNOTATIONS_FILE):
         with open(ANNOTATIONS_FILE) as f:
-            return json.load(f)
-    return {}
+            annotations = json.load(f)
+    if _journal_state()["pending"]:
+        for op in _read_journal(_journal["base"])[0]:
+            apply_annotation_op(annotations, op)
+    return annotations
 
 
 def save_annotations(data):
-    with open(ANNOTATIONS_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_json_atomic(ANNOTATIONS_FILE, data, indent=2)
+    # The new base hash already invalidates the journal; removing it just saves space
+    if os.path.exists(JOURNAL_FILE):
+        os.remove(JOURNAL_FILE)
+    _journal.update(key=_journal_key(), base=_base_hash(), pending=0)
+
+
+def validate_annotation_ops(ops):
+    """Normalized copies of PATCH ops; ValueError if any op is malformed, before anything is written."""
+    if not isinstance(ops, list):
+        raise ValueError("ops must be a list")
+    clean = []
+    for op in ops:
+        if not (isinstance(op, dict) and isinstance(op.get("page"), str) and isinstance(op.get("tag"), str)
+                and (op.get("ann") is None or isinstance(op["ann"], dict))):
+            raise ValueError(f"bad annotation op: {op!r}")
+        clean.append({"page": op["page"], "tag": op["tag"], "ann": op.get("ann")})
+    return clean
+
+
+def patch_annotations(ops):
+    """Append a batch of validated delta ops to the journal as one line; compact periodically.
+
+    Returns the number of ops now pending in the journal.
+    """
+    state = _journal_state()
+    batch = json.dumps({"ops": ops}) + "\n"
+    if state["pending"] == 0:
+        # Start a fresh journal bound to the current base file
+        mode, batch = 'w', json.dumps({"base": state["base"]}) + "\n" + batch
+    else:
+        mode = 'a'
+    with open(JOURNAL_FILE, mode) as f:
+        f.write(batch)
+        f.flush()
+        os.fsync(f.fileno())
+    state["pending"] += len(ops)
+    if state["pending"] >= JOURNAL_COMPACT_OPS:
+        save_annotations(load_annotations())
+    return _journal["pending"]
 
 
 # Map ref_ tags to where they belong in reference_material.json
@@ -227,39 +459,47 @@ def _place_ref_images_inline(ref_data, ref_tags):
     return placed
 
 
-def process_annotations(annotations):
-    from PIL import Image
-    os.makedirs(Q_IMAGES_DIR, exist_ok=True)
-    for f in os.listdir(Q_IMAGES_DIR):
-        os.remove(os.path.join(Q_IMAGES_DIR, f))
+def _file_sha256(path, cache):
+    """Content hash of a page scan, reusing the cached value while size/mtime match."""
+    st = os.stat(path)
+    entry = cache.get(path)
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["sha256"]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    cache[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+    return cache[path]["sha256"]
 
-    result = {"cropped": 0, "updated": 0, "no_image_marked": 0, "errors": []}
-    tag_to_file = {}
-    no_image_tags = set()
 
-    for page_filename, anns in annotations.items():
-        img_path = os.path.join(IMAGES_DIR, page_filename)
-        img = None
+def _crop_key(page_hash, ann):
+    rect = (ann["x1"], ann["y1"], ann["x2"], ann["y2"])
+    return hashlib.sha256(f"{page_hash}:{rect}:{ann['tag']}".encode()).hexdigest()
 
-        for ann in anns:
-            tag = ann["tag"]
-            # Handle "no image" markers (no rectangle to crop)
-            if ann.get("no_image"):
-                no_image_tags.add(tag)
-                continue
 
-            if not os.path.exists(img_path):
-                result["errors"].append(f"Missing: {page_filename}")
-                continue
-            if img is None:
-                img = Image.open(img_path)
+def _crop_page(img_path, jobs, store_dir):
+    """Worker: crop every (tag, rect) job from one page scan into the image store.
+
+    Returns (tag, asset, dhash, size) per crop; look-alike merging happens in the parent.
+    """
+    from PIL import Image
+    done = []
+    with Image.open(img_path) as img:
+        for tag, rect in jobs:
+            done.append((tag, *image_store.store_image(img.crop(rect), store_dir)))
+    return done
+
+
+def _load_crops():
+    if os.path.exists(CROPS_FILE):
+        with open(CROPS_FILE) as f:
+            return json.load(f)
+    return {"pages": {}, "crops": {}}
 
-            cropped = img.crop((ann["x1"], ann["y1"], ann["x2"], ann["y2"]))
-            fname = f"{tag}.png"
-            cropped.save(os.path.join(Q_IMAGES_DIR, fname))
-            tag_to_file[tag] = f"question_images/{fname}"
-            result["cropped"] += 1
 
+def _point_json_at_crops(tag_to_file, no_image_tags, result, progress=None):
+    """Set image_file/has_image in the exam JSONs and place ref_ images in reference_material.json."""
     for f in os.listdir(EXTRACTED_DIR):
         if not f.endswith('.json') or 'exam' not in f:
             continue
@@ -302,8 +542,9 @@ def process_annotations(annotations):
                 modified = True
 
         if modified:
-            with open(fp, 'w') as fh:
-                json.dump(data, fh, indent=2, ensure_ascii=False)
+            write_json_atomic(fp, data, indent=2, ensure_ascii=False)
+            if progress:
+                progress(result)
 
     # Update reference_material.json with ref_ tags placed inline
     ref_tags = {k: v for k, v in tag_to_file.items() if k.startswith("ref_")}
@@ -316,26 +557,608 @@ def process_annotations(annotations):
             ref_data.pop("images", None)
             # Place images inline in sections and points
             placed = _place_ref_images_inline(ref_data, ref_tags)
-            with open(ref_fp, 'w') as fh:
-                json.dump(ref_data, fh, indent=2, ensure_ascii=False)
+            write_json_atomic(ref_fp, ref_data, indent=2, ensure_ascii=False)
             result["updated"] += placed
 
+
+def process_annotations(annotations, jobs=None, progress=None):
+    """Crop annotated images and point the exam/reference JSONs at them.
+
+    progress, if given, is called with the running result dict after each page
+    is cropped and each exam file is updated.
+    """
+    os.makedirs(Q_IMAGES_DIR, exist_ok=True)
+    state = _load_crops()
+    prev_crops = state["crops"]
+    crops = {}
+
+    result = {"total": 0, "cropped": 0, "unchanged": 0, "removed": 0, "assets": 0, "updated": 0,
+              "no_image_marked": 0, "errors": []}
+    tag_to_file = {}
+    no_image_tags = set()
+    page_jobs = {}
+
+    for page_filename, anns in annotations.items():
+        img_path = os.path.join(IMAGES_DIR, page_filename)
+        page_hash = None
+
+        for ann in anns:
+            tag = ann["tag"]
+            # Handle "no image" markers (no rectangle to crop)
+            if ann.get("no_image"):
+                no_image_tags.add(tag)
+                continue
+
+            if not os.path.exists(img_path):
+                result["errors"].append(f"Missing: {page_filename}")
+                continue
+            if page_hash is None:
+                page_hash = _file_sha256(img_path, state["pages"])
+
+            key = _crop_key(page_hash, ann)
+            result["total"] += 1
+            crops[tag] = {"key": key}
+
+            prev = prev_crops.get(tag)
+            if prev and prev["key"] == key and prev.get("asset") and \
+                    os.path.exists(os.path.join(Q_IMAGES_DIR, prev["asset"])):
+                crops[tag] = prev
+                tag_to_file[tag] = f"question_images/{prev['asset']}"
+                result["unchanged"] += 1
+                continue
+            rect = (ann["x1"], ann["y1"], ann["x2"], ann["y2"])
+            page_jobs.setdefault(img_path, []).append((tag, rect))
+
+    # Fan page groups out across processes; each worker opens its page scan once
+    if progress:
+        progress(result)
+    cropped = []
+    if page_jobs:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=POOL_CONTEXT) as pool:
+            futures = [pool.submit(_crop_page, path, page, Q_IMAGES_DIR) for path, page in page_jobs.items()]
+            for fut in as_completed(futures):
+                try:
+                    done = fut.result()
+                except Exception as e:
+                    result["errors"].append(str(e))
+                    continue
+                cropped += done
+                result["cropped"] += len(done)
+                if progress:
+                    progress(result)
+
+    # Register new crops in tag order, so the same look-alike wins on every run
+    store = image_store.ImageStore(Q_IMAGES_DIR)
+    for tag, asset, dhash, size in sorted(cropped):
+        crops[tag]["asset"] = store.add(asset, dhash, size)
+        tag_to_file[tag] = f"question_images/{crops[tag]['asset']}"
+
+    # Remove assets no tag references any more (including merged look-alikes)
+    state["crops"] = {tag: c for tag, c in crops.items() if "asset" in c}
+    result["removed"] = store.collect({c["asset"] for c in state["crops"].values()})
+    result["assets"] = len(store.assets)
+    store.save()
+    write_json_atomic(CROPS_FILE, state)
+
+    # Only the JSON read-modify-writes need the lock; cropping runs alongside autosaves
+    with WRITE_LOCK:
+        _point_json_at_crops(tag_to_file, no_image_tags, result, progress)
     return result
 
 
+# Background /api/process jobs: id -> job dict, guarded by _jobs_cond
+JOBS = {}
+MAX_FINISHED_JOBS = 20
+_jobs_cond = threading.Condition()
+_job_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="process-job")
+
+
+def _update_job(job, **fields):
+    with _jobs_cond:
+        job.update(fields)
+        job["elapsed"] = round(time.monotonic() - job["_started"], 3) if job["_started"] else 0.0
+        job["rate"] = round(job["cropped"] / job["elapsed"], 1) if job["elapsed"] else 0.0
+        job["seq"] += 1
+        _jobs_cond.notify_all()
+
+
+def _run_process_job(job, annotations):
+    def progress(result):
+        _update_job(job, **{k: result[k] for k in ("total", "cropped", "unchanged", "updated")},
+                    errors=list(result["errors"]))
+
+    _update_job(job, status="running", _started=time.monotonic())
+    try:
+        result = process_annotations(annotations, progress=progress)
+    except Exception as e:
+        _update_job(job, status="error", errors=job["errors"] + [str(e)])
+        return
+    progress(result)
+    _update_job(job, status="done", result=result)
+
+
+def start_process_job(annotations):
+    """Queue process_annotations() on the background runner and return the new job."""
+    job = {"id": uuid.uuid4().hex[:12], "status": "queued", "seq": 0, "_started": None,
+           "total": 0, "cropped": 0, "unchanged": 0, "updated": 0, "errors": [],
+           "elapsed": 0.0, "rate": 0.0, "result": None}
+    with _jobs_cond:
+        finished = [j for j in JOBS.values() if j["status"] in ("done", "error")]
+        for old in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del JOBS[old["id"]]
+        JOBS[job["id"]] = job
+    _job_runner.submit(_run_process_job, job, annotations)
+    return job
+
+
+def job_snapshot(job):
+    with _jobs_cond:
+        return {k: v for k, v in job.items() if not k.startswith("_")}
+
+
+_page_hashes = {}
+
+
+def scaled_page_image(page_filename, width, tile=None):
+    """Downscaled page scan (or one TILE_SIZE tile of it), cached on disk as WebP.
+
+    Returns (path, content_type, meta); meta gives the full-resolution size, the
+    full-resolution pixels per served pixel and, for tiles, the tile's origin in
+    full-resolution coordinates, so annotation rects stay in page-scan pixels.
+    Falls back to the original PNG when no downscale is needed or Pillow is missing.
+    """
+    src = os.path.join(IMAGES_DIR, page_filename)
+    full_w, full_h = png_size(src)
+    width = min(full_w, -(-width // SCALE_STEP) * SCALE_STEP)
+    meta = {"full_width": full_w, "full_height": full_h, "scale": full_w / width, "origin": (0, 0)}
+    if width >= full_w and tile is None:
+        return src, 'image/png', dict(meta, scale=1.0)
+    try:
+        from PIL import Image
+    except ImportError:
+        return src, 'image/png', dict(meta, scale=1.0)
+
+    height = max(1, round(full_h * width / full_w))
+    box = None
+    if tile is not None:
+        col, row = tile
+        box = (col * TILE_SIZE, row * TILE_SIZE,
+               min((col + 1) * TILE_SIZE, width), min((row + 1) * TILE_SIZE, height))
+        if box[0] >= width or box[1] >= height:
+            return None, None, meta
+        meta["origin"] = (round(box[0] * meta["scale"]), round(box[1] * meta["scale"]))
+
+    page_hash = _file_sha256(src, _page_hashes)
+    key = hashlib.sha256(f"{page_hash}:{width}:{tile}:{SCALED_QUALITY}".encode()).hexdigest()[:32]
+    out = os.path.join(PAGE_CACHE_DIR, f"{key}.webp")
+    if not os.path.exists(out):
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        with Image.open(src) as img:
+            scaled = img.convert('RGB').resize((width, height), Image.LANCZOS)
+        if box:
+            scaled = scaled.crop(box)
+        tmp = f"{out}.{threading.get_ident()}.tmp"
+        scaled.save(tmp, 'WEBP', quality=SCALED_QUALITY)
+        os.replace(tmp, out)
+    return out, 'image/webp', meta
+
+
+# Crop proposals for /api/suggest. Pages are analysed at 1/SUGGEST_SCALE size: ink is
+# anything clearly darker than the paper or strongly coloured, long thin table rules
+# are dropped, and connected components at least MIN_REGION_PX on each side that are not
+# shaped like a line of text become candidate crops.
+SUGGEST_SCALE = 4
+INK_DARKNESS = 48  # gray levels below the paper (the page's median) that count as ink
+INK_SATURATION = 64  # max - min over RGB above which a pixel counts as colour
+RULE_FRACTION = 0.4  # ink runs spanning this much of the page width/height are rules...
+RULE_THICKNESS_PX = 16  # ...where they are at most this thick (not where they cross an image)
+MIN_REGION_PX = 64  # smallest side of a proposal in page pixels; text lines are shorter
+MAX_REGION_ASPECT = 8  # longer side over shorter side; anything flatter is text or a rule
+REGION_PADDING = 4  # page pixels added around each proposal
+GUTTER_PX = 48  # an empty vertical strip this wide in the middle third splits the columns
+SKIP_COST = 16.0  # alignment cost, in question pitches, of leaving a region or question unmatched
+REGION_PARAMS = (SUGGEST_SCALE, INK_DARKNESS, INK_SATURATION, RULE_FRACTION, RULE_THICKNESS_PX,
+                 MIN_REGION_PX, MAX_REGION_ASPECT, REGION_PADDING, GUTTER_PX)
+# find_regions() results keyed by page hash + REGION_PARAMS (also kept in PAGE_CACHE_DIR)
+_region_cache = {}
+
+
+def _long_runs(mask, min_len):
+    """Pixels of a boolean image lying in horizontal runs at least min_len long."""
+    import numpy as np
+    h, w = mask.shape
+    padded = np.zeros((h, w + 2), np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded.ravel())
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    long = ends - starts >= min_len
+    marks = np.zeros(padded.size, np.int32)
+    marks[starts[long] + 1] += 1
+    marks[ends[long] + 1] -= 1
+    return (np.cumsum(marks) > 0).reshape(h, w + 2)[:, 1:-1]
+
+
+def _components(mask):
+    """Bounding boxes (x1, y1, x2, y2, inclusive) of the 4-connected components of a boolean image.
+
+    Union-find over the whole edge list at once: each pass hooks every root onto the
+    smallest root it touches and pointer-jumps until every node points at its root,
+    so labelling takes a handful of array passes rather than a Python loop per pixel.
+    """
+    import numpy as np
+    h, w = mask.shape
+    idx = np.flatnonzero(mask)
+    if not len(idx):
+        return np.zeros((0, 4), np.int64)
+    node = np.full(mask.size, -1, np.int64)
+    node[idx] = np.arange(len(idx))
+    right = np.zeros_like(mask)
+    right[:, :-1] = mask[:, :-1] & mask[:, 1:]
+    down = np.zeros_like(mask)
+    down[:-1] = mask[:-1] & mask[1:]
+    a, b = np.flatnonzero(right), np.flatnonzero(down)
+    u, v = node[np.concatenate([a, b])], node[np.concatenate([a + 1, b + w])]
+
+    parent = np.arange(len(idx))
+    while True:
+        ru, rv = parent[u], parent[v]
+        joins = ru != rv
+        if not joins.any():
+            break
+        u, v, ru, rv = u[joins], v[joins], ru[joins], rv[joins]
+        np.minimum.at(parent, np.maximum(ru, rv), np.minimum(ru, rv))
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+    order = np.argsort(parent, kind='stable')
+    labels = parent[order]
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ys, xs = np.divmod(idx[order], w)
+    return np.stack([np.minimum.reduceat(xs, starts), np.minimum.reduceat(ys, starts),
+                     np.maximum.reduceat(xs, starts), np.maximum.reduceat(ys, starts)], axis=1)
+
+
+def _merge_overlapping(boxes):
+    """Union boxes that overlap, repeating until none do (merging can create new overlaps)."""
+    import numpy as np
+    while len(boxes) > 1:
+        x1, y1, x2, y2 = (boxes[:, i] for i in range(4))
+        overlap = ((x1[:, None] <= x2[None, :]) & (x1[None, :] <= x2[:, None]) &
+                   (y1[:, None] <= y2[None, :]) & (y1[None, :] <= y2[:, None]))
+        if overlap.sum() == len(boxes):
+            break
+        # Group i is its lowest-numbered overlapping box, taken transitively
+        group = overlap.argmax(axis=1)
+        while not np.array_equal(group[group], group):
+            group = group[group]
+        boxes = np.array([[x1[g].min(), y1[g].min(), x2[g].max(), y2[g].max()]
+                          for g in (group == k for k in np.unique(group))])
+    return boxes
+
+
+def _reading_order(boxes, split):
+    """Boxes by column, then top to bottom; boxes beside each other read left to right."""
+    ordered = []
+    for column in (0, 1):
+        rest = sorted((b for b in boxes if (split is not None and b[0] >= split) == column),
+                      key=lambda b: b[1])
+        while rest:
+            middle = (rest[0][1] + rest[0][3]) / 2
+            row = [b for b in rest if b[1] < middle]
+            ordered += sorted(row, key=lambda b: b[0])
+            rest = [b for b in rest if b[1] >= middle]
+    return ordered
+
+
+def find_regions(img):
+    """Candidate image regions on a page scan, as page-pixel [x1, y1, x2, y2] in reading order.
+
+    Also returns the page's content extent (first and last rows with ink), which
+    match_regions() uses to estimate where each question sits, and the x of the
+    column gutter, or None on single-column pages.
+    """
+    import numpy as np
+    s = SUGGEST_SCALE
+    full_w, full_h = img.size
+    w, h = full_w // s, full_h // s
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    # Per-plane maximum/minimum: a reduction over the interleaved RGB axis is ~10x slower
+    r, g, b = (np.asarray(band)[:h * s, :w * s] for band in img.split())
+    spread = np.maximum(np.maximum(r, g), b) - np.minimum(np.minimum(r, g), b)
+    gray = np.asarray(img.convert('L'))[:h * s, :w * s]
+    paper = np.median(gray[::8, ::8])
+    ink = (gray < paper - INK_DARKNESS) | (spread > INK_SATURATION)
+    # A cell is ink if any of its pixels is, so thin sign outlines survive the downscale
+    rows = np.logical_or.reduce([ink[k::s] for k in range(s)])
+    mask = np.logical_or.reduce([rows[:, k::s] for k in range(s)])
+    thick = RULE_THICKNESS_PX // s + 1
+    rules = ((_long_runs(mask, RULE_FRACTION * w) & ~_long_runs(mask.T, thick).T) |
+             (_long_runs(mask.T, RULE_FRACTION * h).T & ~_long_runs(mask, thick)))
+    mask &= ~rules
+
+    rows = np.flatnonzero(mask.any(axis=1))
+    content = [int(rows[0]) * s, int(rows[-1] + 1) * s] if len(rows) else [0, full_h]
+    # Columns: the widest ink-free strip in the middle third, if it is wide enough
+    empty = np.r_[False, ~mask.any(axis=0)[w // 3:2 * w // 3], False].astype(np.int8)
+    edges = np.diff(empty)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    split = None
+    if len(starts) and (ends - starts).max() * s >= GUTTER_PX:
+        k = (ends - starts).argmax()
+        split = (w // 3 + (starts[k] + ends[k]) // 2) * s
+
+    boxes = _components(mask)
+    bw, bh = boxes[:, 2] - boxes[:, 0] + 1, boxes[:, 3] - boxes[:, 1] + 1
+    keep = ((np.minimum(bw, bh) * s >= MIN_REGION_PX) &
+            (np.maximum(bw, bh) <= MAX_REGION_ASPECT * np.minimum(bw, bh)))
+    boxes = _merge_overlapping(boxes[keep])
+    regions = [[max(0, int(x1) * s - REGION_PADDING), max(0, int(y1) * s - REGION_PADDING),
+                min(full_w, int(x2 + 1) * s + REGION_PADDING), min(full_h, int(y2 + 1) * s + REGION_PADDING)]
+               for x1, y1, x2, y2 in boxes]
+    return {"content": content,
+            "columns": None if split is None else int(split),
+            "regions": _reading_order(regions, split)}
+
+
+def page_regions(page_filename):
+    """find_regions() for a page scan, cached in memory and in PAGE_CACHE_DIR by content hash."""
+    src = os.path.join(IMAGES_DIR, page_filename)
+    page_hash = _file_sha256(src, _page_hashes)
+    key = hashlib.sha256(f"{page_hash}:{REGION_PARAMS}".encode()).hexdigest()[:32]
+    if key in _region_cache:
+        return _region_cache[key]
+    out = os.path.join(PAGE_CACHE_DIR, f"regions_{key}.json")
+    if os.path.exists(out):
+        with open(out) as f:
+            result = json.load(f)
+    else:
+        from PIL import Image
+        with Image.open(src) as img:
+            result = find_regions(img)
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        write_json_atomic(out, result)
+    _region_cache[key] = result
+    return result
+
+
+def _align(region_y, target_y, pitch):
+    """Order-preserving pairing of regions with targets by height: an edit distance where a
+    match costs its distance in pitches and leaving either side unmatched costs SKIP_COST.
+    Returns the matched (region, target) index pairs.
+    """
+    n, m = len(region_y), len(target_y)
+    cost = [[(i + j) * SKIP_COST for j in range(m + 1)] for i in range(n + 1)]
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            cost[i][j] = min(cost[i - 1][j - 1] + abs(region_y[i - 1] - target_y[j - 1]) / pitch,
+                             cost[i - 1][j] + SKIP_COST, cost[i][j - 1] + SKIP_COST)
+    pairs = []
+    i, j = n, m
+    while i and j:
+        if cost[i][j] == cost[i - 1][j] + SKIP_COST:
+            i -= 1
+        elif cost[i][j] == cost[i][j - 1] + SKIP_COST:
+            j -= 1
+        else:
+            i, j = i - 1, j - 1
+            pairs.append((i, j))
+    return pairs[::-1]
+
+
+def match_regions(regions, questions, content, skip=()):
+    """Pair regions (in reading order) with the page's expected image questions, keeping both in order.
+
+    Exam questions run down the page at a roughly even pitch, so a first guess at each
+    question's height is interpolated from its number across the content extent. The
+    line through the matched pairs then replaces the guess (headers and margins throw
+    it off) until the pairing settles. Reference pages (question number 0) are paired
+    in reading order. Returns (one tag or None per region, unmatched tags); tags in
+    `skip` are left out.
+    """
+    targets = [q for q in questions if q["has_image"] and q["tag"] not in skip]
+    numbers = [q["number"] for q in questions if q["number"] > 0]
+    if not numbers or any(q["number"] <= 0 for q in targets):
+        tags = [q["tag"] for q in targets]
+        return (tags + [None] * len(regions))[:len(regions)], tags[len(regions):]
+
+    lo, hi = min(numbers), max(numbers)
+    pitch = max(1.0, (content[1] - content[0]) / (hi - lo + 1))
+    start = content[0] - lo * pitch
+    # Images are top-aligned with their question's first line, however long its text runs
+    region_y = [r[1] for r in regions]
+    pairs = None
+    for _ in range(4):
+        found = _align(region_y, [start + q["number"] * pitch for q in targets], pitch)
+        if found == pairs:
+            break
+        pairs = found
+        ns = [targets[j]["number"] for _, j in pairs]
+        if len(set(ns)) < 2:
+            break
+        # Least-squares line y = start + pitch * number through the matched pairs
+        mean_n, mean_y = sum(ns) / len(ns), sum(region_y[i] for i, _ in pairs) / len(pairs)
+        slope = (sum((n - mean_n) * (region_y[i] - mean_y) for n, (i, _) in zip(ns, pairs)) /
+                 sum((n - mean_n) ** 2 for n in ns))
+        if slope <= 0:
+            break
+        pitch, start = slope, mean_y - slope * mean_n
+
+    tags = [None] * len(regions)
+    for i, j in pairs:
+        tags[i] = targets[j]["tag"]
+    matched = {j for _, j in pairs}
+    return tags, [q["tag"] for j, q in enumerate(targets) if j not in matched]
+
+
+def _mostly_overlaps(a, b):
+    """Whether rects a and b share more than half of the smaller one's area."""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return w > 0 and h > 0 and w * h * 2 > smaller
+
+
+def suggest_crops(page_filename):
+    """/api/suggest: proposed crop rects for a page, tagged with the question each one matches.
+
+    Rects that mostly overlap an existing annotation are left out, as are questions
+    already annotated or marked as having no image.
+    """
+    page = next((p for p in get_pages_data() if p["filename"] == page_filename), None)
+    analysis = page_regions(page_filename)
+    with WRITE_LOCK:
+        anns = load_annotations().get(page_filename, [])
+    drawn = [(a["x1"], a["y1"], a["x2"], a["y2"]) for a in anns if not a.get("no_image")]
+    regions = [r for r in analysis["regions"] if not any(_mostly_overlaps(r, d) for d in drawn)]
+    tags, unmatched = match_regions(regions, page["image_questions"] if page else [],
+                                    analysis["content"], {a["tag"] for a in anns})
+    return {
+        "page": page_filename,
+        "suggestions": [{"x1": r[0], "y1": r[1], "x2": r[2], "y2": r[3], "tag": tag}
+                        for r, tag in zip(regions, tags)],
+        "unmatched": unmatched,
+    }
+
+
+# Request metrics served at /api/metrics: per-route counts, status codes, body
+# bytes sent and a latency histogram. Bucket i counts requests that took at most
+# LATENCY_BUCKETS_MS[i] ms (and more than the previous bound); the last bucket
+# counts the rest.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_METRIC_ROUTES = ('/', '/index.html', '/api/pages', '/api/annotations', '/api/save',
+                  '/api/process', '/api/metrics', '/api/suggest')
+_metrics = {"started": time.time(), "routes": {}}
+_metrics_lock = threading.Lock()
+
+
+def route_label(method, raw_path):
+    """'GET /images/p12.png?w=1024' -> 'GET /images/<page>?w': one metrics series per endpoint."""
+    url = urlparse(raw_path)
+    path = url.path
+    if path.startswith('/images/'):
+        query = parse_qs(url.query)
+        route = '/images/<page>' + ('?tile' if 'tile' in query else '?w' if 'w' in query else '')
+    elif path.startswith('/api/jobs/'):
+        route = '/api/jobs/<id>' + ('/events' if path.endswith('/events') else '')
+    elif path in _METRIC_ROUTES:
+        route = path
+    else:
+        route = '<other>'
+    return f"{method} {route}"
+
+
+def record_request(label, status, seconds, nbytes):
+    ms = seconds * 1000
+    with _metrics_lock:
+        m = _metrics["routes"].get(label)
+        if m is None:
+            m = _metrics["routes"][label] = {"count": 0, "status": {}, "bytes": 0, "total_ms": 0.0,
+                                             "max_ms": 0.0, "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+        m["count"] += 1
+        m["status"][str(status)] = m["status"].get(str(status), 0) + 1
+        m["bytes"] += nbytes
+        m["total_ms"] += ms
+        m["max_ms"] = max(m["max_ms"], ms)
+        m["histogram"][bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+
+
+def _histogram_quantile(m, q):
+    """Upper bound of the bucket holding the q-quantile (the max for the overflow bucket)."""
+    rank = q * m["count"]
+    seen = 0
+    for bound, n in zip(LATENCY_BUCKETS_MS, m["histogram"]):
+        seen += n
+        if seen >= rank:
+            return min(bound, m["max_ms"])
+    return m["max_ms"]
+
+
+def metrics_snapshot():
+    with _metrics_lock:
+        routes = {label: dict(m, status=dict(m["status"]), histogram=list(m["histogram"]))
+                  for label, m in _metrics["routes"].items()}
+    for m in routes.values():
+        m["mean_ms"] = round(m["total_ms"] / m["count"], 3)
+        for q in (50, 90, 99):
+            m[f"p{q}_ms"] = round(_histogram_quantile(m, q / 100), 3)
+        m["total_ms"] = round(m["total_ms"], 3)
+        m["max_ms"] = round(m["max_ms"], 3)
+    return {
+        "uptime": round(time.time() - _metrics["started"], 1),
+        "buckets_ms": list(LATENCY_BUCKETS_MS),
+        "requests": sum(m["count"] for m in routes.values()),
+        "bytes": sum(m["bytes"] for m in routes.values()),
+        "routes": dict(sorted(routes.items())),
+    }
+
+
 class Handler(http.server.BaseHTTPRequestHandler):
+    def handle_one_request(self):
+        self._started = None
+        try:
+            super().handle_one_request()
+        finally:
+            # A handler that raised before responding is counted as a 500
+            if self._started is not None:
+                record_request(route_label(self.command or '-', getattr(self, 'path', '')), self._status or 500,
+                               time.perf_counter() - self._started, self._bytes_sent)
+
+    def parse_request(self):
+        # Timed from here rather than from the read, which idles on keep-alive connections
+        self._started = time.perf_counter()
+        self._status = None
+        self._bytes_sent = 0
+        return super().parse_request()
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'content-length':
+            self._bytes_sent += int(value)
+        super().send_header(keyword, value)
+
     def do_GET(self):
-        path = urlparse(self.path).path
+        url = urlparse(self.path)
+        path = url.path
         if path in ('/', '/index.html'):
             self._serve_file(os.path.join(BASE_DIR, 'image_annotator.html'), 'text/html')
         elif path == '/api/pages':
-            self._send_json(get_pages_data())
+            self._send_cached_json(get_pages_payload())
         elif path == '/api/annotations':
-            self._send_json(load_annotations())
+            with WRITE_LOCK:
+                annotations = load_annotations()
+            self._send_json(annotations)
+        elif path == '/api/metrics':
+            self._send_json(metrics_snapshot())
+        elif path == '/api/suggest':
+            self._serve_suggestions(parse_qs(url.query))
+        elif path.startswith('/api/jobs/'):
+            job_id, _, tail = path[len('/api/jobs/'):].partition('/')
+            job = JOBS.get(job_id)
+            if job is None:
+                self.send_error(404)
+            elif tail == 'events':
+                self._stream_job(job)
+            else:
+                self._send_json(job_snapshot(job))
         elif path.startswith('/images/'):
-            fp = os.path.join(IMAGES_DIR, path[8:])
+            page_filename = os.path.basename(path[8:])
+            fp = os.path.join(IMAGES_DIR, page_filename)
             if os.path.exists(fp):
-                self._serve_file(fp, 'image/png')
+                # Only a URL carrying the current version may be cached forever
+                query = parse_qs(url.query)
+                versioned = query.get('v', [None])[0] == file_version(fp)
+                cache_control = IMMUTABLE_CACHE if versioned else 'no-cache'
+                if 'w' in query or 'tile' in query:
+                    self._serve_scaled(page_filename, query, cache_control)
+                else:
+                    self._serve_file(fp, 'image/png', cache_control)
             else:
                 self.send_error(404)
         else:
@@ -346,31 +1169,189 @@ class Handler(http.server.BaseHTTPRequestHandler):
         data = json.loads(body) if body else {}
         path = urlparse(self.path).path
         if path == '/api/save':
-            save_annotations(data)
+            with WRITE_LOCK:
+                save_annotations(data)
             self._send_json({"status": "ok"})
         elif path == '/api/process':
-            result = process_annotations(data)
-            self._send_json(result)
+            job = start_process_job(data)
+            self._send_json(job_snapshot(job), status=202)
+        else:
+            self.send_error(404)
+
+    def do_PATCH(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        path = urlparse(self.path).path
+        if path == '/api/annotations':
+            # The whole batch is checked before any of it is journaled
+            try:
+                data = json.loads(body) if body else {}
+                ops = validate_annotation_ops(data.get("ops", []) if isinstance(data, dict) else None)
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            with WRITE_LOCK:
+                pending = patch_annotations(ops)
+            self._send_json({"status": "ok", "pending": pending})
         else:
             self.send_error(404)
 
-    def _serve_file(self, fp, ct):
+    def _stream_job(self, job):
+        """Server-Sent Events: one message per job update until it finishes."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        seq = -1
+        while True:
+            with _jobs_cond:
+                # Re-send the current state every 15 s as a keep-alive
+                _jobs_cond.wait_for(lambda: job["seq"] != seq, timeout=15)
+                seq = job["seq"]
+            snapshot = job_snapshot(job)
+            message = f"data: {json.dumps(snapshot)}\n\n".encode()
+            try:
+                self.wfile.write(message)
+                self.wfile.flush()
+                self._bytes_sent += len(message)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            if snapshot["status"] in ("done", "error"):
+                return
+
+    def _serve_scaled(self, page_filename, query, cache_control):
+        """/images/<page>?w=<width>[&tile=<col>,<row>]: resized page scan or one tile of it."""
         try:
-            with open(fp, 'rb') as f:
-                content = f.read()
-            self.send_response(200)
-            self.send_header('Content-Type', ct)
-            self.send_header('Content-Length', len(content))
-            self.end_headers()
-            self.wfile.write(content)
+            width = int(query.get('w', ['0'])[0]) or png_size(os.path.join(IMAGES_DIR, page_filename))[0]
+            tile = tuple(int(n) for n in query['tile'][0].split(',')) if 'tile' in query else None
+            if width <= 0 or (tile and (len(tile) != 2 or min(tile) < 0)):
+                raise ValueError
+        except ValueError:
+            self.send_error(400)
+            return
+        fp, ct, meta = scaled_page_image(page_filename, width, tile)
+        if fp is None:
+            self.send_error(404)
+            return
+        self._serve_file(fp, ct, cache_control, {
+            'X-Full-Size': f"{meta['full_width']}x{meta['full_height']}",
+            'X-Scale': f"{meta['scale']:.6f}",
+            'X-Origin': f"{meta['origin'][0]},{meta['origin'][1]}",
+        })
+
+    def _serve_suggestions(self, query):
+        """/api/suggest?page=<page>: proposed crops for the page's image questions."""
+        page_filename = os.path.basename(query.get('page', [''])[0])
+        if not page_filename:
+            self.send_error(400)
+            return
+        if not os.path.exists(os.path.join(IMAGES_DIR, page_filename)):
+            self.send_error(404)
+            return
+        try:
+            data = suggest_crops(page_filename)
+        except ImportError:
+            self.send_error(501, "Crop suggestions need NumPy and Pillow")
+            return
+        self._send_json(data)
+
+    def _not_modified(self, etag, mtime):
+        """Evaluate If-None-Match / If-Modified-Since against the file's validators."""
+        inm = self.headers.get('If-None-Match')
+        if inm is not None:
+            return etag in [t.strip() for t in inm.split(',')] or inm.strip() == '*'
+        ims = self.headers.get('If-Modified-Since')
+        if ims:
+            try:
+                return int(mtime) <= email.utils.parsedate_to_datetime(ims).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _parse_range(self, size):
+        """Single 'bytes=a-b' range -> (start, end) inclusive, None for whole file, or 'invalid'."""
+        header = self.headers.get('Range')
+        m = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip()) if header else None
+        if not m or m.group(1) == m.group(2) == '':
+            return None
+        if m.group(1) == '':
+            start, end = max(0, size - int(m.group(2))), size - 1
+        else:
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+        if start >= size or start > end:
+            return 'invalid'
+        return start, end
+
+    def _serve_file(self, fp, ct, cache_control='no-cache', extra_headers=None):
+        try:
+            f = open(fp, 'rb')
         except FileNotFoundError:
             self.send_error(404)
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+            validators = {
+                'ETag': etag,
+                'Last-Modified': email.utils.formatdate(st.st_mtime, usegmt=True),
+                'Cache-Control': cache_control,
+                **(extra_headers or {}),
+            }
+            if self._not_modified(etag, st.st_mtime):
+                self.send_response(304)
+                for k, v in validators.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                return
 
-    def _send_json(self, data):
-        content = json.dumps(data).encode()
+            rng = self._parse_range(st.st_size)
+            if rng == 'invalid':
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{st.st_size}')
+                self.send_header('Content-Length', 0)
+                self.end_headers()
+                return
+            start, end = rng or (0, st.st_size - 1)
+            length = end - start + 1
+
+            self.send_response(206 if rng else 200)
+            self.send_header('Content-Type', ct)
+            self.send_header('Content-Length', length)
+            self.send_header('Accept-Ranges', 'bytes')
+            if rng:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{st.st_size}')
+            for k, v in validators.items():
+                self.send_header(k, v)
+            self.end_headers()
+            # Zero-copy: the kernel streams the file straight to the socket
+            if length > 0:
+                self.connection.sendfile(f, start, length)
+
+    def _send_cached_json(self, entry):
+        """Send a pre-serialized JSON payload, honoring If-None-Match and gzip."""
+        if self.headers.get('If-None-Match') == entry["etag"]:
+            self.send_response(304)
+            self.send_header('ETag', entry["etag"])
+            self.end_headers()
+            return
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        content = entry["gzip"] if use_gzip else entry["body"]
         self.send_response(200)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Content-Length', len(content))
+        self.send_header('ETag', entry["etag"])
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_json(self, data, status=200):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', len(content))
         self.end_headers()
         self.wfile.write(content)
 
@@ -381,12 +1362,21 @@ class Handler(http.server.BaseHTTPRequestHandler):
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Image annotation tool server")
+    parser.add_argument('--single-threaded', action='store_true',
+                        help="handle one request at a time (default: a thread per request)")
+    args = parser.parse_args()
+
     print(f"\n  Image Annotation Tool")
     print(f"  Open http://localhost:{PORT} in your browser")
     print(f"  Press Ctrl+C to stop\n")
-    server = http.server.HTTPServer(('localhost', PORT), Handler)
+    server_cls = http.server.HTTPServer if args.single_threaded else http.server.ThreadingHTTPServer
+    server = server_cls(('localhost', PORT), Handler)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\nStopped.")
         server.server_close()
+        # Fold any journaled edits back into image_annotations.json
+        if _journal_state()["pending"]:
+            save_annotations(load_annotations())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for cropped question images.
+
+Crops are saved in extracted/question_images/ as <pixel hash>.png, so an
+image cropped in several exams is stored once. A perceptual pass (dHash,
+confirmed by a small pixel comparison) also merges crops that look the same
+without being byte-identical, such as the same sign cropped a pixel larger
+on another page. image_annotator.py writes crops through here and
+build_site_data.py hard-links the store into docs/images.
+
+Usage:
+    python3 image_store.py migrate   # move legacy <tag>.png crops into the store
+    python3 image_store.py stats
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+
+STORE_DIR = os.path.join("extracted", "question_images")
+INDEX_NAME = ".store.json"
+ASSET_RE = re.compile(r"^[0-9a-f]{16}\.png$")
+
+# Perceptual matching: dHash within DHASH_MAX_DISTANCE bits finds candidates, then
+# the crops must be within MAX_CROP_SLACK pixels in size and, at the best alignment,
+# match pixel for pixel. Deliberately strict: a wrong merge shows the wrong sign,
+# a missed one only costs a file.
+DHASH_MAX_DISTANCE = 4
+DHASH_BANDS = DHASH_MAX_DISTANCE + 1  # any pair within the distance shares a band
+MAX_CROP_SLACK = 4
+VERIFY_TOLERANCE = 48  # grayscale levels two aligned pixels may differ by
+VERIFY_MAX_PIXELS = 3  # pixels allowed beyond that, so one changed digit still makes two signs differ
+
+
+def pixel_digest(img):
+    """Asset name for an image: hash of its mode, size and pixels (not its PNG encoding)."""
+    h = hashlib.sha256(f"{img.mode}:{img.size}:".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()[:16] + ".png"
+
+
+def dhash(img):
+    """64-bit difference hash: brightness gradients across a 9x8 grayscale thumbnail."""
+    from PIL import Image
+    small = img.convert("L").resize((9, 8), Image.LANCZOS)
+    px = small.tobytes()
+    bits = 0
+    for y in range(8):
+        for x in range(8):
+            bits = (bits << 1) | (px[y * 9 + x] > px[y * 9 + x + 1])
+    return bits
+
+
+def store_image(img, store_dir=STORE_DIR, src_path=None):
+    """Save img under its content hash unless already present. Safe to call from pool workers.
+
+    src_path, an existing PNG of img, is moved into place instead of re-encoding.
+    Returns (asset, dhash as hex, [width, height]).
+    """
+    asset = pixel_digest(img)
+    path = os.path.join(store_dir, asset)
+    if not os.path.exists(path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        if src_path:
+            os.replace(src_path, tmp)
+        else:
+            img.save(tmp, "PNG")
+        os.replace(tmp, path)
+    return asset, f"{dhash(img):016x}", list(img.size)
+
+
+def _bands(hex_hash):
+    bits = int(hex_hash, 16)
+    width = -(-64 // DHASH_BANDS)
+    return [(i, (bits >> (i * width)) & ((1 << width) - 1)) for i in range(DHASH_BANDS)]
+
+
+def _looks_same(path_a, path_b):
+    """Pixel check behind a dHash match: slide the larger crop over the smaller one
+    and look for an alignment where almost every pixel agrees."""
+    from PIL import Image, ImageChops
+    with Image.open(path_a) as a, Image.open(path_b) as b:
+        a, b = a.convert("L"), b.convert("L")
+    if a.width < b.width:
+        a, b = b, a
+    dw, dh = a.width - b.width, a.height - b.height
+    for x in range(dw + 1):
+        for y in range(min(dh, 0), max(dh, 0) + 1):
+            # A negative dh means b is taller: crop it instead
+            window = a.crop((x, max(y, 0), x + b.width, max(y, 0) + min(a.height, b.height)))
+            other = b.crop((0, max(-y, 0), b.width, max(-y, 0) + window.height))
+            diff = ImageChops.difference(window, other)
+            if sum(diff.histogram()[VERIFY_TOLERANCE + 1:]) <= VERIFY_MAX_PIXELS:
+                return True
+    return False
+
+
+class ImageStore:
+    """The store's index ({asset: {dhash, size}}) with dHash band buckets for lookups."""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.dir = store_dir
+        self.index_path = os.path.join(store_dir, INDEX_NAME)
+        self.assets = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                self.assets = json.load(f)["assets"]
+        self.buckets = {}
+        for asset, info in self.assets.items():
+            self._bucket(asset, info)
+
+    def _bucket(self, asset, info):
+        for band in _bands(info["dhash"]):
+            self.buckets.setdefault(band, []).append(asset)
+
+    def _similar(self, asset, info):
+        w, h = info["size"]
+        candidates = {a for band in _bands(info["dhash"]) for a in self.buckets.get(band, ())}
+        for other in sorted(candidates):
+            o = self.assets[other]
+            ow, oh = o["size"]
+            if bin(int(info["dhash"], 16) ^ int(o["dhash"], 16)).count("1") > DHASH_MAX_DISTANCE:
+                continue
+            if abs(w - ow) > MAX_CROP_SLACK or abs(h - oh) > MAX_CROP_SLACK:
+                continue
+            if _looks_same(os.path.join(self.dir, asset), os.path.join(self.dir, other)):
+                return other
+        return None
+
+    def add(self, asset, dhash_hex, size):
+        """Register a stored asset; returns the asset to reference instead (itself or a look-alike)."""
+        if asset in self.assets:
+            return asset
+        info = {"dhash": dhash_hex, "size": size}
+        match = self._similar(asset, info)
+        if match:
+            return match
+        self.assets[asset] = info
+        self._bucket(asset, info)
+        return asset
+
+    def collect(self, keep):
+        """Delete store files (assets and legacy crops) not in `keep`. Returns how many."""
+        removed = 0
+        for fname in os.listdir(self.dir):
+            if fname.endswith(".png") and fname not in keep:
+                os.remove(os.path.join(self.dir, fname))
+                removed += 1
+        self.assets = {a: info for a, info in self.assets.items() if a in keep}
+        self.buckets = {}
+        for asset, info in self.assets.items():
+            self._bucket(asset, info)
+        return removed
+
+    def save(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"assets": dict(sorted(self.assets.items()))}, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+
+# --- Migration from one-PNG-per-tag crops ---
+
+def _rewrite_image_files(node, renames):
+    """Replace image_file values found in `renames`, anywhere in a JSON document."""
+    changed = 0
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "image_file" and value in renames:
+                node[key] = renames[value]
+                changed += 1
+            else:
+                changed += _rewrite_image_files(value, renames)
+    elif isinstance(node, list):
+        for item in node:
+            changed += _rewrite_image_files(item, renames)
+    return changed
+
+
+def migrate(store_dir=STORE_DIR, extracted_dir="extracted"):
+    """Move <tag>.png crops into the store and repoint the exam/reference JSONs and crop cache."""
+    from PIL import Image
+
+    store = ImageStore(store_dir)
+    existing = {f for f in os.listdir(store_dir) if ASSET_RE.match(f)}
+    renames = {}
+    for fname in sorted(os.listdir(store_dir)):
+        if not fname.endswith(".png") or ASSET_RE.match(fname):
+            continue
+        path = os.path.join(store_dir, fname)
+        with Image.open(path) as img:
+            img.load()
+        asset = store.add(*store_image(img, store_dir, src_path=path))
+        renames[f"question_images/{fname}"] = f"question_images/{asset}"
+
+    rewritten = 0
+    for fname in sorted(os.listdir(extracted_dir)):
+        if not fname.endswith(".json") or ("exam" not in fname and fname != "reference_material.json"):
+            continue
+        path = os.path.join(extracted_dir, fname)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        n = _rewrite_image_files(data, renames)
+        if n:
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, path)
+            rewritten += n
+
+    # The annotator's crop cache keyed tags to <tag>.png; point it at the assets
+    crops_path = os.path.join(store_dir, ".crops.json")
+    if os.path.exists(crops_path):
+        with open(crops_path, encoding="utf-8") as f:
+            state = json.load(f)
+        for tag, crop in list(state.get("crops", {}).items()):
+            moved = renames.get(f"question_images/{tag}.png")
+            if moved:
+                crop["asset"] = moved[len("question_images/"):]
+            else:
+                del state["crops"][tag]
+        with open(crops_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    keep = existing | {r[len("question_images/"):] for r in renames.values()}
+    store.collect(keep)
+    store.save()
+    return len(renames), len(store.assets), rewritten
+
+
+def stats(store_dir=STORE_DIR):
+    store = ImageStore(store_dir)
+    files = [f for f in os.listdir(store_dir) if f.endswith(".png")]
+    size = sum(os.path.getsize(os.path.join(store_dir, f)) for f in files)
+    return {"assets": len(store.assets), "files": len(files), "bytes": size}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv == ["migrate"]:
+        crops, assets, rewritten = migrate()
+        print(f"Moved {crops} crops into {assets} assets in {STORE_DIR}/; rewrote {rewritten} image_file fields")
+    elif argv == ["stats"]:
+        s = stats()
+        print(f"{s['assets']} assets, {s['files']} files, {s['bytes'] / 1e6:.1f} MB in {STORE_DIR}/")
+    else:
+        print(__doc__.strip())
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""
+Python port of the study app's spaced-repetition scheduler.
+
+policy.Scheduler replays pickQuestion()/submitAnswer() from docs/app.js with
+incrementally maintained buckets; scheduler.simulate (requires NumPy) runs
+many simulated learners against it to compare Policy weights. See
+`python3 -m scheduler --help`.
+"""
+
+from .policy import BUCKETS, Policy, Scheduler, load_questions, status
@@ -0,0 +1,84 @@
+"""
+Compare scheduler weights by simulated time to mastery.
+
+Usage:
+    python3 -m scheduler --learners 100000
+    python3 -m scheduler --weights 60,30,10/70,30 --weights 80,15,5/50,50 --category lp
+    python3 -m scheduler --learners 2000 --check 200   # also run the slow Scheduler replay
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from .policy import QUESTIONS_FILE, Policy, load_questions
+from .simulate import BATCH_SIZE, LearnerModel, simulate, simulate_reference
+
+
+def parse_weights(text):
+    """'60,30,10/70,30' -> Policy weights (wrong/unseen/in_progress, then unseen/in_progress)."""
+    wrong, _, unseen = text.partition("/")
+    wrong = tuple(float(w) for w in wrong.split(","))
+    unseen = tuple(float(w) for w in unseen.split(",")) if unseen else (70, 30)
+    if len(wrong) != 3 or len(unseen) != 2:
+        raise argparse.ArgumentTypeError(f"expected W,U,P/U,P weights, got {text!r}")
+    return wrong, unseen
+
+
+def summarize(steps):
+    import numpy as np
+    done = steps[steps > 0]
+    if not len(done):
+        return "nobody finished"
+    p50, p90 = np.percentile(done, [50, 90])
+    return (f"mean {done.mean():7.1f}  median {p50:6.0f}  p90 {p90:6.0f}  "
+            f"gave up {100 * (1 - len(done) / len(steps)):.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate learners to compare scheduler weights.")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--category", default="all", choices=["all", "lp", "dl", "danger"])
+    parser.add_argument("--weights", action="append", type=parse_weights, metavar="W,U,P/U,P",
+                        help="weights while anything is wrong / once nothing is (repeatable; default 60,30,10/70,30)")
+    parser.add_argument("--recent", type=int, default=10, help="recently shown questions to skip")
+    parser.add_argument("--learners", type=int, default=BATCH_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--learn-rate", type=float, default=0.5)
+    parser.add_argument("--prior", default="2,2", help="Beta(a,b) prior on knowing a question beforehand")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: all CPUs)")
+    parser.add_argument("--check", type=int, default=0, metavar="N",
+                        help="also replay N learners through policy.Scheduler for comparison")
+    args = parser.parse_args(argv)
+
+    questions = load_questions(args.questions, args.category)
+    prior_a, prior_b = (float(x) for x in args.prior.split(","))
+    model = LearnerModel(prior_a, prior_b, learn_rate=args.learn_rate)
+    print(f"{len(questions)} questions ({args.category}), {args.learners} learners, "
+          f"learn rate {args.learn_rate}, prior Beta({prior_a:g},{prior_b:g})")
+
+    for wrong, unseen in args.weights or [((60, 30, 10), (70, 30))]:
+        policy = Policy(wrong, unseen, args.recent)
+        start = time.perf_counter()
+        # The same seed for every policy: learners see the same random draws, which
+        # keeps the comparison paired instead of drowning it in sampling noise
+        result = simulate(questions, policy, model, args.learners, args.seed, args.batch_size, jobs=args.jobs)
+        elapsed = time.perf_counter() - start
+        label = "/".join(",".join(f"{w:g}" for w in ws) for ws in (wrong, unseen))
+        print(f"{label:<16} answers to mastery: {summarize(result['steps'])}")
+        finished = result["knowledge"][result["steps"] > 0]
+        print(f"{'':<16} knowledge at mastery {finished.mean() if len(finished) else float('nan'):.3f}, "
+              f"accuracy {result['accuracy']:.3f}, {result['learner_steps'] / elapsed / 1e6:.2f}M answers/s "
+              f"({elapsed:.1f}s)")
+        if args.check:
+            start = time.perf_counter()
+            ref = simulate_reference(questions, policy, model, args.check, args.seed)
+            elapsed = time.perf_counter() - start
+            print(f"{'  Scheduler':<16} answers to mastery: {summarize(ref['steps'])} ({elapsed:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+The study app's question-selection policy (pickQuestion/nextQuestion/submitAnswer
+in docs/app.js) with incremental buckets, so a pick costs O(1) instead of a
+scan over every question.
+"""
+
+import collections
+import json
+import os
+import random
+
+from build_site_data import CATEGORIES, danger_group
+
+QUESTIONS_FILE = os.path.join("docs", "data", "questions.json")
+
+# Bucket order matters to the vectorized simulator, which keeps them as contiguous segments
+BUCKETS = ("wrong", "unseen", "in_progress", "mastered")
+WRONG, UNSEEN, IN_PROGRESS, MASTERED = range(4)
+
+
+class Policy:
+    """Tunable knobs of pickQuestion(); the defaults are what the app ships."""
+
+    def __init__(self, wrong_weights=(60, 30, 10), unseen_weights=(70, 30), recent=10):
+        self.wrong_weights = tuple(wrong_weights)  # wrong / unseen / in_progress while anything is wrong
+        self.unseen_weights = tuple(unseen_weights)  # unseen / in_progress once nothing is wrong
+        self.recent = recent  # questions shown this recently are skipped while alternatives exist
+
+    def __repr__(self):
+        return (f"Policy(wrong_weights={self.wrong_weights}, unseen_weights={self.unseen_weights}, "
+                f"recent={self.recent})")
+
+
+def status(entry):
+    """getQuestionStatus() for a {correct, wrong, streak} progress entry (or None)."""
+    if entry is None:
+        return UNSEEN
+    if entry["streak"] >= 1:
+        return MASTERED
+    if entry["wrong"] > 0:
+        return WRONG
+    return IN_PROGRESS
+
+
+def load_questions(path=QUESTIONS_FILE, category="all"):
+    """Question records for a home-screen filter ("all", "lp", "dl" or "danger")."""
+    with open(path, encoding="utf-8") as f:
+        questions = json.load(f)
+    if category == "all":
+        return questions
+    return [q for q in questions if CATEGORIES[category](q)]
+
+
+class IndexedSet:
+    """Set with O(1) add, remove and uniform random choice (list + position map)."""
+
+    def __init__(self):
+        self.items = []
+        self.pos = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.pos
+
+    def add(self, item):
+        if item not in self.pos:
+            self.pos[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item):
+        i = self.pos.pop(item)
+        last = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+            self.pos[last] = i
+
+    def choice(self, rng, exclude=()):
+        """Uniform pick among items not in `exclude` (a small set), or None."""
+        excluded = sum(1 for x in exclude if x in self.pos)
+        if excluded == len(self.items):
+            return None
+        if excluded * 2 <= len(self.items):
+            # Rejection sampling: expected < 2 draws
+            while True:
+                item = self.items[rng.randrange(len(self.items))]
+                if item not in exclude:
+                    return item
+        return rng.choice([x for x in self.items if x not in exclude])
+
+
+class Scheduler:
+    """One learner's study session over a question list.
+
+    Mirrors the app: next() serves queued danger siblings first, then picks
+    by policy; answer() updates progress (marking danger siblings wrong on a
+    wrong answer). Buckets are updated as statuses change rather than rebuilt.
+    """
+
+    def __init__(self, questions, progress=None, policy=None, rng=None):
+        self.policy = policy or Policy()
+        self.rng = rng or random.Random()
+        self.ids = [q["id"] for q in questions]
+        self.danger = {q["id"] for q in questions if q["type"] == "danger"}
+        groups = collections.defaultdict(list)
+        for qid in self.ids:
+            if qid in self.danger:
+                groups[danger_group(qid)].append(qid)
+        self.groups = dict(groups)  # siblings in questions.json order, like getDangerSiblings()
+
+        self.progress = {qid: dict(p) for qid, p in (progress or {}).items()}
+        self.buckets = [IndexedSet() for _ in BUCKETS]
+        self.status = {}
+        for qid in self.ids:
+            s = status(self.progress.get(qid))
+            self.status[qid] = s
+            self.buckets[s].add(qid)
+        self.history = collections.deque(maxlen=self.policy.recent)
+        self.danger_queue = collections.deque()
+
+    def counts(self):
+        return {name: len(b) for name, b in zip(BUCKETS, self.buckets)}
+
+    def mastered(self):
+        return len(self.buckets[MASTERED]) == len(self.ids)
+
+    def _weighted(self, options, recent):
+        """weightedPick(): choose a bucket by weight among those with unrecent members."""
+        options = [(b, w) for b, w in options if len(self.buckets[b]) > sum(1 for x in recent if self.status[x] == b)]
+        if not options:
+            return None
+        r = self.rng.random() * sum(w for _, w in options)
+        for b, w in options:
+            r -= w
+            if r <= 0:
+                break
+        return self.buckets[b].choice(self.rng, recent)
+
+    def pick(self):
+        """pickQuestion(): the next question id by policy, ignoring the danger queue."""
+        p = self.policy
+        recent = set(self.history)
+        pools = [len(b) - sum(1 for x in recent if self.status[x] == i) for i, b in enumerate(self.buckets)]
+
+        chosen = None
+        if pools[WRONG] > 0:
+            chosen = self._weighted(zip((WRONG, UNSEEN, IN_PROGRESS), p.wrong_weights), recent)
+        elif pools[UNSEEN] > 0:
+            chosen = self._weighted(zip((UNSEEN, IN_PROGRESS), p.unseen_weights), recent)
+        elif pools[IN_PROGRESS] > 0:
+            chosen = self.buckets[IN_PROGRESS].choice(self.rng, recent)
+        elif pools[MASTERED] > 0:
+            chosen = self.buckets[MASTERED].choice(self.rng, recent)
+
+        if chosen is None:
+            # Everything was shown recently: any non-mastered question, else any question
+            sizes = [len(self.buckets[b]) for b in (WRONG, UNSEEN, IN_PROGRESS)]
+            if sum(sizes):
+                k = self.rng.randrange(sum(sizes))
+                for b, size in zip((WRONG, UNSEEN, IN_PROGRESS), sizes):
+                    if k < size:
+                        return self.buckets[b].items[k]
+                    k -= size
+            chosen = self.buckets[MASTERED].choice(self.rng) if self.ids else None
+        return chosen
+
+    def next(self):
+        """nextQuestion(): queued danger siblings first, then a policy pick."""
+        if self.danger_queue:
+            qid = self.danger_queue.popleft()
+        else:
+            qid = self.pick()
+            if qid in self.danger:
+                self.danger_queue.extend(x for x in self.groups[danger_group(qid)] if x != qid)
+        if qid is not None:
+            self.history.append(qid)
+        return qid
+
+    def _set(self, qid, entry):
+        self.progress[qid] = entry
+        new = status(entry)
+        old = self.status[qid]
+        if new != old:
+            self.buckets[old].remove(qid)
+            self.buckets[new].add(qid)
+            self.status[qid] = new
+
+    def answer(self, qid, correct):
+        """submitAnswer(): record the result and move the question (and siblings) between buckets."""
+        entry = dict(self.progress.get(qid) or {"correct": 0, "wrong": 0, "streak": 0})
+        if correct:
+            entry["correct"] += 1
+            entry["streak"] += 1
+        else:
+            entry["wrong"] += 1
+            entry["streak"] = 0
+            if qid in self.danger:
+                for sib in self.groups[danger_group(qid)]:
+                    if sib != qid:
+                        s = dict(self.progress.get(sib) or {"correct": 0, "wrong": 0, "streak": 0})
+                        s["wrong"] += 1
+                        s["streak"] = 0
+                        self._set(sib, s)
+        self._set(qid, entry)
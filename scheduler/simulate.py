@@ -0,0 +1,300 @@
+"""
+Vectorized learner simulator for comparing Policy weights by time to mastery.
+
+Each batch steps thousands of simulated learners in lockstep with NumPy. Per
+learner, the questions are kept in one permutation array partitioned into
+contiguous bucket segments (wrong | unseen | in_progress | mastered), so a
+status change is at most three swaps and a uniform pick inside a bucket is a
+single index, the same O(1) bookkeeping as policy.Scheduler.
+
+The learner model is deliberately simple: each question starts known with a
+per-question probability (its difficulty, drawn once from a Beta prior and
+shared by every learner), unknown questions are guessed at 50%, and seeing
+the answer after each attempt closes `learn_rate` of the remaining gap.
+"""
+
+import collections
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .policy import BUCKETS, IN_PROGRESS, MASTERED, UNSEEN, WRONG, Policy, Scheduler
+from build_site_data import danger_group
+
+BATCH_SIZE = 10000
+MAX_STEPS_PER_QUESTION = 20  # learners still unfinished after this many answers per question give up
+
+
+class LearnerModel:
+    """How simulated learners answer and learn."""
+
+    def __init__(self, prior_a=2.0, prior_b=2.0, learn_rate=0.5, guess=0.5, seed=0):
+        self.prior_a = prior_a  # Beta(a, b) prior on a question being known before studying it
+        self.prior_b = prior_b
+        self.learn_rate = learn_rate  # share of the remaining gap closed by seeing the answer
+        self.guess = guess  # chance of a correct guess on an unknown True/False question
+        self.seed = seed  # fixes question difficulties, so policies are compared on the same deck
+
+    def known(self, n_questions):
+        """Per-question probability of already knowing the answer."""
+        rng = np.random.default_rng(self.seed)
+        return rng.beta(self.prior_a, self.prior_b, n_questions).astype(np.float32)
+
+
+def question_layout(questions):
+    """Danger sibling table for a question list: (siblings[Q, G-1] padded with -1, is_danger[Q])."""
+    groups = collections.defaultdict(list)
+    for i, q in enumerate(questions):
+        if q["type"] == "danger":
+            groups[danger_group(q["id"])].append(i)
+    width = max((len(g) - 1 for g in groups.values()), default=0)
+    siblings = np.full((len(questions), max(width, 1)), -1, dtype=np.int32)
+    is_danger = np.zeros(len(questions), dtype=bool)
+    for members in groups.values():
+        for i in members:
+            others = [j for j in members if j != i]
+            siblings[i, :len(others)] = others
+            is_danger[i] = True
+    return siblings, is_danger
+
+
+class _Batch:
+    """State of `n` learners studying the same deck from scratch."""
+
+    def __init__(self, n, known, siblings, policy, rng):
+        q = len(known)
+        idx = np.int16 if q < 2 ** 15 else np.int32
+        self.n, self.q = n, q
+        self.rng = rng
+        self.policy = policy
+        self.siblings = siblings
+        self.learner = np.arange(n)
+        self.order = np.tile(np.arange(q, dtype=idx), (n, 1))
+        self.pos = self.order.copy()
+        self.status = np.full((n, q), UNSEEN, dtype=np.int8)
+        # bounds[:, b] is where segment b starts; everything begins unseen
+        self.bounds = np.zeros((n, len(BUCKETS) + 1), dtype=np.int32)
+        self.bounds[:, UNSEEN + 1:] = q
+        self.know = np.tile(known, (n, 1))
+        self.recent = np.full((n, max(policy.recent, 1)), -1, dtype=np.int32)
+        self.queue = np.full((n, siblings.shape[1]), -1, dtype=np.int32)
+        self.queue_head = np.zeros(n, dtype=np.int32)
+        self.queue_len = np.zeros(n, dtype=np.int32)
+        self.finished = np.zeros(n, dtype=bool)
+
+    def compact(self, keep):
+        names = ("order", "pos", "status", "bounds", "know", "recent", "queue", "queue_head", "queue_len", "finished")
+        for name in names:
+            setattr(self, name, getattr(self, name)[keep])
+        self.n = int(keep.sum())
+        self.learner = self.learner[keep]
+
+    def _swap(self, base, qs, j):
+        """Swap question qs with whatever sits at position j; base is each learner's row * q."""
+        order, pos = self.order.ravel(), self.pos.ravel()
+        i = pos[base + qs]
+        other = order[base + j]
+        order[base + i] = other
+        order[base + j] = qs
+        pos[base + other] = i
+        pos[base + qs] = j
+
+    def move(self, rows, qs, new):
+        """Change the status of question qs[k] for learner rows[k] to `new`, keeping segments contiguous."""
+        flat = rows * self.q + qs
+        status = self.status.ravel()
+        cur = status[flat].astype(np.int32)
+        status[flat] = new
+        bounds = self.bounds.ravel()
+        width = self.bounds.shape[1]
+        while True:
+            up = cur < new
+            down = cur > new
+            if up.any():
+                # Swap to the end of the current segment, then shrink it by one
+                r, c = rows[up], cur[up]
+                edge = r * width + c + 1
+                self._swap(r * self.q, qs[up], bounds[edge] - 1)
+                bounds[edge] -= 1
+                cur[up] += 1
+            elif not down.any():
+                return
+            if down.any():
+                # Swap to the start of the current segment, then grow the one before
+                r, c = rows[down], cur[down]
+                edge = r * width + c
+                self._swap(r * self.q, qs[down], bounds[edge])
+                bounds[edge] += 1
+                cur[down] -= 1
+
+    def pick(self, rows):
+        """pickQuestion() for the given learner rows."""
+        p, rng, q = self.policy, self.rng, self.q
+        n = len(rows)
+        ids = np.arange(n)
+        bounds = self.bounds[rows]
+        sizes = np.diff(bounds, axis=1)
+
+        # Recently shown questions, de-duplicated, with their status (-1 for empty slots)
+        recent = np.sort(self.recent[rows], axis=1)
+        valid = recent >= 0
+        valid[:, 1:] &= recent[:, 1:] != recent[:, :-1]
+        flat = (rows * q)[:, None] + np.where(valid, recent, 0)
+        r_status = np.where(valid, self.status.ravel()[flat], -1)
+        per_bucket = np.bincount((ids[:, None] * 5 + r_status + 1).ravel(), minlength=n * 5)
+        pools = sizes - per_bucket.reshape(n, 5)[:, 1:]
+
+        # The policy's case is the first bucket with a pool: wrong, unseen, in_progress,
+        # mastered, else the fallback; weightedPick() skips buckets with empty pools
+        has = pools > 0
+        case = np.argmax(np.column_stack([has, np.ones(n, dtype=bool)]), axis=1)
+        table = np.zeros((len(BUCKETS) + 1, len(BUCKETS)))
+        table[WRONG, :3] = p.wrong_weights
+        table[UNSEEN, 1:3] = p.unseen_weights
+        table[IN_PROGRESS, IN_PROGRESS] = 1
+        table[MASTERED, MASTERED] = 1
+        weights = table[case] * has
+
+        # weightedPick(): the first bucket whose running total reaches r
+        cum = weights.cumsum(axis=1)
+        r = (1 - rng.random(n)) * cum[:, -1]
+        bucket = np.minimum((cum < r[:, None]).sum(axis=1), len(BUCKETS) - 1)
+
+        # Uniform over the bucket minus recent questions: draw a rank among the
+        # pool, then step over the excluded offsets in ascending order
+        start = bounds[ids, bucket]
+        k = np.floor(rng.random(n) * np.maximum(pools[ids, bucket], 1)).astype(np.int32)
+        excluded = valid & (r_status == bucket[:, None])
+        offsets = np.full(excluded.shape, q + 1, dtype=np.int32)
+        offsets[excluded] = self.pos.ravel()[flat[excluded]] - np.broadcast_to(start[:, None], excluded.shape)[excluded]
+        offsets.sort(axis=1)
+        for j in range(offsets.shape[1]):
+            k += offsets[:, j] <= k
+        chosen = self.order.ravel()[rows * q + np.minimum(start + k, q - 1)].astype(np.int32)
+
+        fallback = case == len(BUCKETS)
+        if fallback.any():
+            # Everything was shown recently: any non-mastered question, else any question
+            non_mastered = bounds[fallback, MASTERED]
+            span = np.where(non_mastered > 0, non_mastered, q)
+            at = np.floor(rng.random(len(span)) * span).astype(np.int32)
+            chosen[fallback] = self.order.ravel()[rows[fallback] * q + at]
+        return chosen
+
+    def step(self, t, model, is_danger):
+        """One nextQuestion()/submitAnswer() round for every learner. Returns how many answered correctly."""
+        rows = np.arange(self.n)
+        qs = np.empty(self.n, dtype=np.int32)
+
+        queued = self.queue_len > 0
+        if queued.any():
+            r = rows[queued]
+            qs[queued] = self.queue[r, self.queue_head[r]]
+            self.queue_head[r] += 1
+            self.queue_len[r] -= 1
+        fresh = ~queued
+        if fresh.any():
+            r = rows[fresh]
+            picked = self.pick(r)
+            qs[fresh] = picked
+            danger = is_danger[picked]
+            if danger.any():
+                d, dq = r[danger], picked[danger]
+                self.queue[d] = self.siblings[dq]
+                self.queue_head[d] = 0
+                self.queue_len[d] = (self.siblings[dq] >= 0).sum(axis=1)
+        self.recent[:, t % self.recent.shape[1]] = qs
+
+        flat = rows * self.q + qs
+        know = self.know.ravel()[flat]
+        correct = self.rng.random(self.n) < know + (1 - know) * model.guess
+        self.know.ravel()[flat] = know + model.learn_rate * (1 - know)
+
+        self.move(rows[correct], qs[correct], MASTERED)
+        self.move(rows[~correct], qs[~correct], WRONG)
+        wrong_danger = ~correct & is_danger[qs]
+        for j in range(self.siblings.shape[1]):
+            sib = self.siblings[qs, j]
+            m = wrong_danger & (sib >= 0)
+            if m.any():
+                self.move(rows[m], sib[m], WRONG)
+        return int(correct.sum())
+
+
+def _run_batch(n, seed, known, siblings, is_danger, policy, model, max_steps):
+    """Simulate n learners; returns (steps, knowledge, answers, correct answers)."""
+    batch = _Batch(n, known, siblings, policy, np.random.default_rng(seed))
+    steps = np.full(n, -1, dtype=np.int64)
+    knowledge = np.full(n, np.nan)
+    total = correct = 0
+    for t in range(max_steps):
+        correct += batch.step(t, model, is_danger)
+        total += batch.n
+        done = (batch.bounds[:, MASTERED] == 0) & ~batch.finished
+        if done.any():
+            ids = batch.learner[done]
+            steps[ids] = t + 1
+            knowledge[ids] = batch.know[done].mean(axis=1)
+            batch.finished |= done
+            if batch.finished.all():
+                break
+            # Finished learners keep stepping (uncounted) until dropping them is worth a copy
+            if batch.finished.mean() > 0.25:
+                batch.compact(~batch.finished)
+    return steps, knowledge, total, correct
+
+
+def simulate(questions, policy=None, model=None, learners=BATCH_SIZE, seed=0,
+             batch_size=BATCH_SIZE, max_steps=None, jobs=1):
+    """Answers each learner needed until every question was mastered at once.
+
+    Batches run across `jobs` processes; each batch is seeded from (seed,
+    batch number), so results do not depend on the job count.
+    Returns {"steps": int array (-1 = gave up), "knowledge": mean true
+    knowledge at that moment, "accuracy": share of correct answers,
+    "learner_steps": answers simulated}.
+    """
+    policy = policy or Policy()
+    model = model or LearnerModel()
+    known = model.known(len(questions))
+    siblings, is_danger = question_layout(questions)
+    max_steps = max_steps or MAX_STEPS_PER_QUESTION * len(questions)
+    sizes = [min(batch_size, learners - first) for first in range(0, learners, batch_size)]
+    args = [(n, [seed, i], known, siblings, is_danger, policy, model, max_steps) for i, n in enumerate(sizes)]
+
+    if jobs > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_run_batch, *zip(*args)))
+    else:
+        results = [_run_batch(*a) for a in args]
+
+    steps, knowledge, totals, corrects = zip(*results or [(np.empty(0, np.int64), np.empty(0), 0, 0)])
+    total = sum(totals)
+    return {"steps": np.concatenate(steps), "knowledge": np.concatenate(knowledge), "learner_steps": total,
+            "accuracy": sum(corrects) / total if total else 0.0}
+
+
+def simulate_reference(questions, policy=None, model=None, learners=100, seed=0, max_steps=None):
+    """The same experiment with policy.Scheduler, one learner at a time: a slow cross-check."""
+    policy = policy or Policy()
+    model = model or LearnerModel()
+    known = model.known(len(questions))
+    position = {q["id"]: i for i, q in enumerate(questions)}
+    max_steps = max_steps or MAX_STEPS_PER_QUESTION * len(questions)
+    rng = random.Random(seed)
+    steps = []
+    for _ in range(learners):
+        sched = Scheduler(questions, policy=policy, rng=rng)
+        know = [float(k) for k in known]
+        for t in range(max_steps):
+            qid = sched.next()
+            i = position[qid]
+            sched.answer(qid, rng.random() < know[i] + (1 - know[i]) * model.guess)
+            know[i] += model.learn_rate * (1 - know[i])
+            if sched.mastered():
+                steps.append(t + 1)
+                break
+        else:
+            steps.append(-1)
+    return {"steps": np.array(steps)}
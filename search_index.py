@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Full-text search over the built site data.
+
+build_site_data.py calls build_index() to write docs/data/search.json; the
+same file is queried here and by searchIndex() in docs/app.js, which mirrors
+tokenize()/stem() exactly.
+
+Usage:
+    python3 search_index.py pedestrian crossing
+"""
+
+import bisect
+import json
+import math
+import os
+import re
+import sys
+
+SEARCH_FILE = os.path.join("docs", "data", "search.json")
+INDEX_VERSION = 1
+
+# BM25 parameters; scores are precomputed per posting and stored as integers
+BM25_K1 = 1.2
+BM25_B = 0.75
+SCORE_SCALE = 10
+TEXT_WEIGHT = 2  # question text/scenario and reference titles count double vs explanations
+MAX_PREFIX_TERMS = 20
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have if in into is it its of on or that the
+their then there these this to was were when which while will with you your
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def stem(word):
+    """Light suffix stripping: plurals, -ing, -ed and a trailing e.
+
+    Deliberately crude (crossing/crossings/crosses -> cross, stopped -> stop);
+    it only has to agree with itself and with stem() in app.js.
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("es") and word[-3] in "sxz" or word.endswith(("ches", "shes")):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercased, stemmed terms of `text`, without stopwords and single letters."""
+    return [stem(t) for t in TOKEN_RE.findall(text.lower())
+            if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+# --- Building ---
+
+def reference_documents(ref):
+    """(location, [(text, weight)]) for each searchable piece of reference.json.
+
+    location is [section, point] into key_points_to_remember.sections, with
+    point -1 for the section itself.
+    """
+    for s, section in enumerate(ref["key_points_to_remember"]["sections"]):
+        fields = [(section.get("title", ""), TEXT_WEIGHT)]
+        for vt in section.get("vehicle_types", []):
+            fields.append((" ".join(str(v) for v in vt.values()), 1))
+        yield [s, -1], fields
+        for p, point in enumerate(section.get("points", [])):
+            text = point if isinstance(point, str) else point.get("text", "")
+            yield [s, p], [(text, 1)]
+
+
+def question_fields(q):
+    return [(q["text"], TEXT_WEIGHT), (q.get("scenario", ""), TEXT_WEIGHT), (q.get("explanation", ""), 1)]
+
+
+def build_index(questions, ref):
+    """Inverted index over questions (in questions.json order), then reference documents.
+
+    Returns a JSON-ready dict. Document numbers below `questions` are positions
+    in questions.json; the rest index into `reference`. Each term's postings
+    are a flat list [doc gap, score, doc gap, score, ...] with doc numbers
+    delta-encoded and BM25 scores pre-multiplied by SCORE_SCALE.
+    """
+    term_freqs, lengths = [], []
+    n_questions = 0
+    for q in questions:
+        n_questions += 1
+        _add_document(term_freqs, lengths, question_fields(q))
+    locations = []
+    for location, fields in reference_documents(ref):
+        locations.append(location)
+        _add_document(term_freqs, lengths, fields)
+
+    n = len(lengths)
+    avg_len = sum(lengths) / n if n else 0
+    postings = {}
+    for doc, tf in enumerate(term_freqs):
+        for term, f in tf.items():
+            postings.setdefault(term, []).append((doc, f))
+
+    terms = {}
+    for term in sorted(postings):
+        docs = postings[term]
+        idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+        flat, prev = [], 0
+        for doc, f in docs:
+            norm = f * (BM25_K1 + 1) / (f + BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc] / avg_len))
+            flat += [doc - prev, max(1, round(idf * norm * SCORE_SCALE))]
+            prev = doc
+        terms[term] = flat
+    return {"version": INDEX_VERSION, "questions": n_questions, "reference": locations, "terms": terms}
+
+
+def _add_document(term_freqs, lengths, fields):
+    tf = {}
+    length = 0
+    for text, weight in fields:
+        for term in tokenize(text or ""):
+            tf[term] = tf.get(term, 0) + weight
+            length += 1
+    term_freqs.append(tf)
+    lengths.append(length)
+
+
+# --- Querying ---
+
+def load_index(path=SEARCH_FILE):
+    with open(path, encoding="utf-8") as f:
+        index = json.load(f)
+    index["sorted_terms"] = sorted(index["terms"])
+    return index
+
+
+def expand_terms(index, term, last):
+    """The term itself if indexed; the last query word may also be a prefix of longer terms."""
+    if term in index["terms"]:
+        return [term]
+    if not last:
+        return []
+    words = index["sorted_terms"]
+    i = bisect.bisect_left(words, term)
+    found = []
+    while i < len(words) and words[i].startswith(term) and len(found) < MAX_PREFIX_TERMS:
+        found.append(words[i])
+        i += 1
+    return found
+
+
+def search(index, query, limit=10):
+    """Ranked hits for `query`: documents matching the most query words first, then by BM25.
+
+    Each hit is {"kind": "question", "position": i} or
+    {"kind": "reference", "section": s, "point": p}, plus its score.
+    """
+    # Deduplicated first, as in the browser: the last distinct word is the one matched as a prefix
+    words = list(dict.fromkeys(tokenize(query)))
+    scores, matched = {}, {}
+    for k, word in enumerate(words):
+        seen = set()
+        for term in expand_terms(index, word, k == len(words) - 1):
+            flat = index["terms"][term]
+            doc = 0
+            for j in range(0, len(flat), 2):
+                doc += flat[j]
+                scores[doc] = scores.get(doc, 0) + flat[j + 1]
+                if doc not in seen:
+                    seen.add(doc)
+                    matched[doc] = matched.get(doc, 0) + 1
+
+    ranked = sorted(scores, key=lambda d: (-matched[d], -scores[d], d))[:limit]
+    n_questions = index["questions"]
+    hits = []
+    for doc in ranked:
+        if doc < n_questions:
+            hit = {"kind": "question", "position": doc}
+        else:
+            section, point = index["reference"][doc - n_questions]
+            hit = {"kind": "reference", "section": section, "point": point}
+        hit["score"] = scores[doc] / SCORE_SCALE
+        hits.append(hit)
+    return hits
+
+
+def main(argv=None):
+    import time
+
+    query = " ".join(sys.argv[1:] if argv is None else argv)
+    if not query:
+        print(__doc__.strip())
+        return 1
+    index = load_index()
+    with open(os.path.join("docs", "data", "questions.json"), encoding="utf-8") as f:
+        questions = json.load(f)
+    with open(os.path.join("docs", "data", "reference.json"), encoding="utf-8") as f:
+        sections = json.load(f)["key_points_to_remember"]["sections"]
+
+    start = time.perf_counter()
+    hits = search(index, query)
+    elapsed = time.perf_counter() - start
+    for hit in hits:
+        if hit["kind"] == "question":
+            q = questions[hit["position"]]
+            print(f"{hit['score']:6.1f}  {q['id']:<14} {q['text']}")
+        else:
+            section = sections[hit["section"]]
+            point = section["points"][hit["point"]] if hit["point"] >= 0 else section["title"]
+            text = point if isinstance(point, str) else point.get("text", "")
+            print(f"{hit['score']:6.1f}  {'ref ' + str(hit['section']):<14} {text}")
+    print(f"{len(hits)} hits in {elapsed * 1000:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())